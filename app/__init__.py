@@ -5,6 +5,10 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Corpora added through POST /corpora are saved in config.ini
+    from app.config_manager import ConfigManager
+    app.config['CORPORA'] = dict(app.config['CORPORA'], **ConfigManager().get_corpora())
+    
     from app.routes import main
     app.register_blueprint(main)
     
@@ -0,0 +1,131 @@
+import os
+import re
+from typing import Dict, List, Tuple
+
+from langchain.docstore.document import Document
+from app.sqlite_index import SQLiteCorpusIndex
+
+# Clause types with the phrases that identify them; heading matches weigh more than body matches
+CLAUSE_TYPES = {
+    'termination': ['terminat', 'cancel', 'expiration of this agreement'],
+    'term': ['term of', 'duration', 'valid for', 'valid until', 'effective date', 'commence'],
+    'renewal': ['renew', 'extension'],
+    'payment': ['payment', 'fees', 'invoice', 'compensation', 'price', 'revenue share', 'royalt'],
+    'liability_cap': ['limitation of liability', 'liability', 'aggregate liability', 'consequential damages'],
+    'indemnification': ['indemnif', 'hold harmless'],
+    'confidentiality': ['confidential', 'non-disclosure', 'proprietary information'],
+    'governing_law': ['governing law', 'jurisdiction', 'venue', 'laws of the state'],
+    'intellectual_property': ['intellectual property', 'ownership', 'license', 'copyright', 'patent'],
+    'deliverables': ['deliverable', 'product terms', 'scope of work', 'services'],
+}
+
+# Phrases match at word starts, so 'terminat' finds 'termination' but 'venue' skips 'revenue'
+_CLAUSE_PATTERNS = {clause_type: [re.compile(r"\b" + re.escape(p)) for p in phrases]
+                    for clause_type, phrases in CLAUSE_TYPES.items()}
+
+# "1. Heading", "2.3 Heading", "Section 4 Heading", "ARTICLE V Heading"
+_HEADING_RE = re.compile(r"^\s*(?:(?:section|article)\s+[\divxlc]+[.:)]?|\d+\.(?:\d+\.?)*|\d+\))\s+(\S.{0,80})$", re.I)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clauses (
+    corpus TEXT NOT NULL,
+    file TEXT NOT NULL,
+    clause_type TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    heading TEXT NOT NULL,
+    body TEXT NOT NULL,
+    score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clauses_lookup ON clauses (corpus, file, clause_type);
+CREATE INDEX IF NOT EXISTS clauses_by_type ON clauses (clause_type);
+"""
+
+def segment_clauses(pages: List[Tuple[int, str]]) -> List[Dict]:
+    """Split a contract's pages into sections that start at numbered headings"""
+    sections = []
+    current = None
+    for page, text in pages:
+        for line in text.splitlines():
+            match = _HEADING_RE.match(line)
+            if match:
+                current = {'heading': line.strip(), 'page': page, 'lines': []}
+                sections.append(current)
+            elif line.strip():
+                if current is None:
+                    current = {'heading': '', 'page': page, 'lines': []}
+                    sections.append(current)
+                current['lines'].append(line.strip())
+    return [{'heading': s['heading'], 'page': s['page'], 'body': ' '.join(s['lines'])} for s in sections]
+
+def classify_clause(heading: str, body: str) -> List[Tuple[str, int]]:
+    """Score a section against every clause type, best first; types without a match are left out"""
+    heading, body = heading.lower(), body.lower()
+    scores = []
+    for clause_type, patterns in _CLAUSE_PATTERNS.items():
+        score = sum(3 * len(p.findall(heading)) + len(p.findall(body)) for p in patterns)
+        if score:
+            scores.append((clause_type, score))
+    return sorted(scores, key=lambda item: -item[1])
+
+def extract_clauses(documents: List[Document], contracts_dir: str) -> List[Tuple[str, str, int, str, str, int]]:
+    """Classify the sections of loaded page documents into (file, type, page, heading, body, score) rows"""
+    pages_by_file: Dict[str, List[Tuple[int, str]]] = {}
+    for doc in documents:
+        file = os.path.relpath(doc.metadata['source'], contracts_dir)
+        pages_by_file.setdefault(file, []).append((doc.metadata.get('page', 0), doc.page_content))
+
+    rows = []
+    for file, pages in pages_by_file.items():
+        for section in segment_clauses(sorted(pages)):
+            matches = classify_clause(section['heading'], section['body'])
+            if not matches:
+                continue
+            # A section counts for its best type, plus any type it names in its heading
+            heading = section['heading'].lower()
+            types = {matches[0][0]} | {t for t, _ in matches if any(p.search(heading) for p in _CLAUSE_PATTERNS[t])}
+            for clause_type, score in matches:
+                if clause_type in types:
+                    rows.append((file, clause_type, section['page'], section['heading'], section['body'], score))
+    return rows
+
+class ClauseIndex(SQLiteCorpusIndex):
+    """SQLite index of classified clauses, keyed by corpus, contract file and clause type.
+
+    Rows are the (file, type, page, heading, body, score) tuples of ``extract_clauses``.
+    """
+    SCHEMA = _SCHEMA
+    TABLE = 'clauses'
+    INSERT = ("INSERT INTO clauses (corpus, file, clause_type, page, heading, body, score) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+    def lookup(self, contracts: List[Tuple[str, str]], clause_types: List[str]) -> Dict:
+        """Get clauses as {(corpus, file): {clause_type: [clause, ...]}}, strongest match first"""
+        result = {contract: {clause_type: [] for clause_type in clause_types} for contract in contracts}
+        if not contracts or not clause_types:
+            return result
+
+        conn = self._connect()
+        try:
+            for corpus, file in contracts:
+                rows = conn.execute(
+                    f"""SELECT clause_type, page, heading, body FROM clauses
+                        WHERE corpus = ? AND file = ? AND clause_type IN ({', '.join('?' for _ in clause_types)})
+                        ORDER BY score DESC, page""",
+                    [corpus, file] + list(clause_types)
+                ).fetchall()
+                for clause_type, page, heading, body in rows:
+                    result[(corpus, file)][clause_type].append({'page': page + 1, 'heading': heading, 'text': body})
+        finally:
+            conn.close()
+        return result
+
+    def contracts(self) -> List[Dict]:
+        """List indexed contracts with the clause types found in each"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT corpus, file, group_concat(DISTINCT clause_type) FROM clauses "
+                                "GROUP BY corpus, file ORDER BY corpus, file").fetchall()
+        finally:
+            conn.close()
+        return [{'corpus': corpus, 'file': file, 'clause_types': sorted(types.split(','))}
+                for corpus, file, types in rows]
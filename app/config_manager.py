@@ -15,6 +15,7 @@ class ConfigManager:
             os.makedirs(self.config_dir)
         
         self.config = configparser.ConfigParser()
+        self.config.optionxform = str  # Keep corpus names as typed
         self.load_config()
 
     def load_config(self):
@@ -25,6 +26,8 @@ class ConfigManager:
         # Create default sections if they don't exist
         if 'Paths' not in self.config:
             self.config['Paths'] = {}
+        if 'Corpora' not in self.config:
+            self.config['Corpora'] = {}
         
         # Set default values if they don't exist
         if 'contracts_dir' not in self.config['Paths']:
@@ -46,6 +49,21 @@ class ConfigManager:
         self.config['Paths']['contracts_dir'] = path
         self.save_config()
 
+    def get_corpora(self):
+        """Get the additional named corpora as a name -> folder mapping"""
+        return dict(self.config['Corpora'])
+
+    def add_corpus(self, name, path):
+        """Add or update a named corpus folder"""
+        self.config['Corpora'][name] = path
+        self.save_config()
+
+    def remove_corpus(self, name):
+        """Remove a named corpus"""
+        if name in self.config['Corpora']:
+            del self.config['Corpora'][name]
+            self.save_config()
+
     def is_setup_complete(self):
         """Check if initial setup is complete"""
         return bool(self.get_contracts_dir().strip()) 
\ No newline at end of file
@@ -0,0 +1,179 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+# tiktoken encoding, loaded on first use since a cold cache downloads it; False once it failed
+_encoding = None
+_encoding_lock = threading.Lock()
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Stats of the most recent packing on this thread, read back by the /ask route
+_last_stats = threading.local()
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:  # tiktoken missing or encoding not downloadable
+                    print(f"Token counts are estimated, tiktoken is unavailable: {str(e)}")
+                    _encoding = False
+    return _encoding or None
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise ~4 characters per token"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, math.ceil(len(text) / 4))
+
+def _term_vector(text: str) -> Counter:
+    return Counter(_WORD_RE.findall(text.lower()))
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b.get(term, 0) for term, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+def _chunk_key(doc: Document):
+    return (doc.metadata.get('source'), doc.metadata.get('page'))
+
+def merge_adjacent_chunks(docs: List[Document]) -> List[Document]:
+    """Merge overlapping or touching chunks from the same page into one chunk.
+
+    Chunks need a ``start_index`` in their metadata (set by the text splitter);
+    the merged chunk keeps the position of the first chunk of its page.
+    """
+    groups: Dict[Any, List[Document]] = {}
+    order = []
+    for doc in docs:
+        key = _chunk_key(doc)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(doc)
+
+    merged = []
+    for key in order:
+        group = groups[key]
+        if len(group) == 1 or any('start_index' not in d.metadata for d in group):
+            merged.extend(group)
+            continue
+
+        group = sorted(group, key=lambda d: d.metadata['start_index'])
+        current = Document(page_content=group[0].page_content, metadata=dict(group[0].metadata))
+        for doc in group[1:]:
+            current_end = current.metadata['start_index'] + len(current.page_content)
+            start = doc.metadata['start_index']
+            if start <= current_end:
+                overlap = current_end - start
+                current.page_content += doc.page_content[overlap:]
+            else:
+                merged.append(current)
+                current = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        merged.append(current)
+    return merged
+
+def pack_context(docs_and_scores: List[Tuple[Document, float]],
+                 token_budget: int = 3000,
+                 mmr_lambda: float = 0.5,
+                 redundancy_threshold: float = 0.9,
+                 baseline_k: int = 10) -> Tuple[List[Document], Dict]:
+    """Select chunks by maximal marginal relevance until the token budget is spent.
+
+    ``docs_and_scores`` is the retriever output ordered by relevance. Chunks
+    that are near-duplicates of an already selected chunk are dropped, and
+    adjacent chunks from the same page are merged. Returns the packed
+    documents and a stats dict comparing against the old fixed top-k prompt.
+    """
+    candidates = [(doc, score, _term_vector(doc.page_content), estimate_tokens(doc.page_content))
+                  for doc, score in docs_and_scores]
+    baseline_tokens = sum(c[3] for c in candidates[:baseline_k])
+
+    selected = []
+    used_tokens = 0
+    dropped_redundant = 0
+    dropped_budget = 0
+    remaining = list(candidates)
+
+    while remaining:
+        best_index, best_score, best_similarity = None, None, 0.0
+        for i, (doc, relevance, vector, tokens) in enumerate(remaining):
+            similarity = max((_cosine(vector, s[2]) for s in selected), default=0.0)
+            mmr_score = mmr_lambda * relevance - (1 - mmr_lambda) * similarity
+            if best_score is None or mmr_score > best_score:
+                best_index, best_score, best_similarity = i, mmr_score, similarity
+
+        candidate = remaining.pop(best_index)
+        if best_similarity >= redundancy_threshold:
+            dropped_redundant += 1
+            continue
+        if selected and used_tokens + candidate[3] > token_budget:
+            dropped_budget += 1
+            continue
+        selected.append(candidate)
+        used_tokens += candidate[3]
+
+    packed = merge_adjacent_chunks([c[0] for c in selected])
+    packed_tokens = sum(estimate_tokens(doc.page_content) for doc in packed)
+
+    stats = {
+        'candidates': len(candidates),
+        'selected_chunks': len(selected),
+        'packed_chunks': len(packed),
+        'dropped_redundant': dropped_redundant,
+        'dropped_budget': dropped_budget,
+        'token_budget': token_budget,
+        'baseline_tokens': baseline_tokens,
+        'packed_tokens': packed_tokens,
+        'tokens_saved': max(0, baseline_tokens - packed_tokens),
+    }
+    return packed, stats
+
+def get_last_pack_stats() -> Dict:
+    """Return the stats of the last context packing done on this thread"""
+    return getattr(_last_stats, 'stats', {})
+
+class PackedContextRetriever(BaseRetriever):
+    """Retriever that over-fetches candidates and packs them into a token budget.
+
+    ``source`` is anything with ``similarity_search_with_relevance_scores``,
+    such as a LangChain vector store.
+    """
+    source: Any
+    fetch_k: int = 20
+    token_budget: int = 3000
+    mmr_lambda: float = 0.5
+    redundancy_threshold: float = 0.9
+    baseline_k: int = 10
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs_and_scores = self.source.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+        docs, stats = pack_context(
+            docs_and_scores,
+            token_budget=self.token_budget,
+            mmr_lambda=self.mmr_lambda,
+            redundancy_threshold=self.redundancy_threshold,
+            baseline_k=self.baseline_k
+        )
+        _last_stats.stats = stats
+        print(f"Packed context: {stats['packed_chunks']} chunks, {stats['packed_tokens']} tokens "
+              f"({stats['tokens_saved']} saved vs top-{self.baseline_k})")
+        return docs
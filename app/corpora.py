@@ -0,0 +1,492 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app, has_app_context
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain.docstore.document import Document
+from app.clauses import ClauseIndex, extract_clauses
+from app.fulltext import FullTextIndex
+from app.profiling import profile_block
+from app.providers import create_embeddings
+from app.snapshots import apply_snapshot, file_key, hash_files, write_snapshot
+from app.vector_index import NumpyVectorIndex, index_lock
+
+DEFAULT_CORPUS = 'default'
+DEFAULT_INDEX_OPTIONS = {
+    'backend': 'chroma',
+    'dtype': 'float16',
+    'index_dir': None,
+    'fulltext_db': None,
+    'clause_db': None,
+    'pages_check_interval': 300,
+    'embedding': {'provider': 'openai', 'model': 'text-embedding-ada-002', 'dimension': 1536}
+}
+
+# Separate pools, so long shard builds never hold up fan-out queries
+_build_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='corpus-build')
+_query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='corpus-query')
+
+def _with_app_context(func):
+    """Run ``func`` on pool threads inside the caller's app context, so its profiling settings apply"""
+    if not has_app_context():
+        return func
+    app = current_app._get_current_object()
+    def wrapper(*args):
+        with app.app_context():
+            return func(*args)
+    return wrapper
+
+def classify_contract_type(filename: str) -> str:
+    """Classify a contract by its file name"""
+    if 'partnership' in filename.lower():
+        return 'Partnership Agreement'
+    if 'nda' in filename.lower() or 'disclosure' in filename.lower():
+        return 'Non-Disclosure Agreement'
+    return 'Other'
+
+def scan_file_state(contracts_dir: str) -> Dict[str, List]:
+    """Get size and modification time of every PDF, to tell whether an index is stale"""
+    state = {}
+    for root, _, files in os.walk(contracts_dir):
+        for file in files:
+            if file.lower().endswith('.pdf'):
+                file_path = os.path.join(root, file)
+                stat = os.stat(file_path)
+                state[file_key(file_path, contracts_dir)] = [stat.st_size, int(stat.st_mtime)]
+    return state
+
+def load_documents(contracts_dir: str, corpus: str = DEFAULT_CORPUS, only: List[str] = None) -> List[Document]:
+    """Load every PDF under a contracts folder (or just the ``only`` relative paths) as one document per page"""
+    documents = []
+    for root, _, files in os.walk(contracts_dir):
+        print(f"\nScanning directory: {root}")
+        pdf_files = [f for f in files if f.lower().endswith('.pdf')]
+        if only is not None:
+            pdf_files = [f for f in pdf_files if file_key(os.path.join(root, f), contracts_dir) in only]
+        print(f"Found PDF files: {pdf_files}")
+
+        for file in pdf_files:
+            file_path = os.path.join(root, file)
+            try:
+                print(f"\nLoading PDF file: {file}")
+                loader = PyMuPDFLoader(file_path)
+                docs = loader.load()
+                print(f"Loaded {len(docs)} pages from {file}")
+                for doc in docs:
+                    doc.metadata['title'] = file  # Add file name to metadata
+                    doc.metadata['corpus'] = corpus
+                    doc.metadata['contract_type'] = classify_contract_type(file)
+                documents.extend(docs)
+                print(f"Successfully loaded PDF: {file}")
+            except Exception as e:
+                print(f"Error loading {file}: {str(e)}")
+    return documents
+
+def split_documents(documents: List[Document]) -> List[Document]:
+    """Split page documents into overlapping chunks for embedding"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""],
+        add_start_index=True  # Lets the context packer merge adjacent chunks
+    )
+    return text_splitter.split_documents(documents)
+
+def to_chroma_filter(filter: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a {field: value or [values]} filter into a Chroma where clause"""
+    clauses = [{field: {'$in': list(value)} if isinstance(value, (list, tuple, set)) else value}
+               for field, value in filter.items()]
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+class IndexShard:
+    """Vector index over the contracts of a single corpus folder"""
+
+    def __init__(self, name: str, contracts_dir: str, options: Dict = None):
+        self.name = name
+        self.contracts_dir = contracts_dir
+        self.options = dict(DEFAULT_INDEX_OPTIONS, **(options or {}))
+        self.vectorstore = None
+        self.file_count = 0
+        self.chunk_count = 0
+        self.built_at = None
+        self.last_error = None
+        self._build_lock = threading.Lock()
+        self._pages_lock = threading.RLock()
+        self._pages_checked = None  # When the page indexes were last matched against the folder
+
+    @property
+    def collection_name(self) -> str:
+        safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', self.name)
+        return f"contracts_{safe_name}"[:63]
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.options['index_dir'], self.collection_name)
+
+    def _index_lock(self):
+        """Hold the on-disk index directory, so worker processes sharing it don't build it twice"""
+        if self.options['backend'] != 'numpy':
+            return nullcontext()
+        return index_lock(self.index_path)
+
+    def _refresh(self):
+        """Switch to a newer generation another worker wrote, e.g. after its /settings/reload_docs"""
+        index = self.vectorstore
+        if not isinstance(index, NumpyVectorIndex) or not index.is_stale():
+            return
+        try:
+            fresh = NumpyVectorIndex(self.index_path, index.embeddings)
+        except Exception as e:
+            print(f"Could not reopen index for '{self.name}': {str(e)}")
+            return
+        self.vectorstore = fresh
+        self.file_count = len(fresh.manifest.get('files', {}))
+        self.chunk_count = len(fresh)
+        self.built_at = os.path.getmtime(os.path.join(self.index_path, 'CURRENT'))
+        print(f"Reopened index shard '{self.name}': {self.chunk_count} chunks")
+
+    def _open_existing(self) -> bool:
+        """Open a persisted index, re-embedding only the files that changed since it was written"""
+        if self.options['backend'] != 'numpy' or not NumpyVectorIndex.exists(self.index_path):
+            return False
+        if not os.path.exists(self.contracts_dir):
+            return False
+        try:
+            index = NumpyVectorIndex(self.index_path, create_embeddings(self.options['embedding']))
+        except Exception as e:
+            print(f"Could not open index for '{self.name}': {str(e)}")
+            return False
+        if index.manifest.get('embedding') != self.options['embedding']:
+            print(f"Index for '{self.name}' was built with another embedding provider, rebuilding")
+            return False
+        files = scan_file_state(self.contracts_dir)
+        old_files = index.manifest.get('files')
+        replaced, documents = [], []
+        if old_files != files:
+            if 'file_hashes' not in index.manifest:
+                print(f"Index for '{self.name}' is stale, rebuilding")
+                return False
+            try:
+                replaced, documents = self._sync(index, files)
+            except Exception as e:
+                print(f"Error updating index for '{self.name}', rebuilding: {str(e)}")
+                return False
+
+        self.vectorstore = index
+        self.file_count = len(files)
+        self.chunk_count = len(index)
+        self.built_at = os.path.getmtime(os.path.join(self.index_path, 'CURRENT'))
+        self.last_error = None
+        print(f"Opened index shard '{self.name}': {self.file_count} files, {self.chunk_count} chunks")
+
+        stale = [index for index in self.page_indexes() if not index.is_current(self.name, files)]
+        # Page indexes that matched the old state only need the replaced files
+        partial = [index for index in stale if old_files != files and index.is_current(self.name, old_files)]
+        if partial:
+            self._index_pages(documents, files, partial, changed=replaced)
+        full = [index for index in stale if index not in partial]
+        if full:
+            self._index_pages(load_documents(self.contracts_dir, self.name), files, full)
+        return True
+
+    def _sync(self, index: NumpyVectorIndex, files: Dict) -> Tuple[List[str], List[Document]]:
+        """Re-embed added or changed files and drop deleted ones; returns the replaced files and their pages"""
+        old_hashes = index.manifest['file_hashes']
+        hashes = hash_files(self.contracts_dir, files, index.manifest.get('files'), old_hashes)
+        changed = sorted(file for file, digest in hashes.items() if old_hashes.get(file) != digest)
+        replaced = changed + sorted(file for file in old_hashes if file not in hashes)
+
+        documents = []
+        if replaced:
+            print(f"Updating index for '{self.name}': {len(changed)} new or changed, "
+                  f"{len(replaced) - len(changed)} removed files")
+            replaced_set = set(replaced)
+            keep = np.asarray([file_key(metadata['source'], self.contracts_dir) not in replaced_set
+                               for _, metadata in index.records()], dtype=bool)
+            if changed:
+                documents = load_documents(self.contracts_dir, self.name, only=changed)
+        splits = split_documents(documents) if documents else []
+        vectors = None
+        if splits:
+            vectors = np.asarray(index.embeddings.embed_documents([doc.page_content for doc in splits]),
+                                 dtype=np.float32)
+        # Rows and file bookkeeping are published together in one generation
+        index.update(keep=keep if replaced else None, texts=[doc.page_content for doc in splits],
+                     metadatas=[doc.metadata for doc in splits], vectors=vectors,
+                     manifest={'files': files, 'file_hashes': hashes})
+        return replaced, documents
+
+    def page_indexes(self) -> List:
+        """The configured indexes filled from page text at ingest (full-text, clauses)"""
+        indexes = []
+        if self.options['fulltext_db']:
+            indexes.append(FullTextIndex.open(self.options['fulltext_db']))
+        if self.options['clause_db']:
+            indexes.append(ClauseIndex.open(self.options['clause_db']))
+        return indexes
+
+    def ensure_pages(self):
+        """Make sure the full-text and clause indexes hold this corpus; needs no embeddings.
+
+        Only a corpus missing from them is indexed on the calling thread. The
+        folder is rescanned for changes in the background, at most once per
+        ``pages_check_interval`` seconds, so queries never walk it.
+        """
+        checked = self._pages_checked
+        if checked is not None and time.time() - checked < self.options['pages_check_interval']:
+            return
+        indexes = self.page_indexes()
+        if not indexes or not os.path.exists(self.contracts_dir):
+            return
+        if checked is None and not all(index.has_corpus(self.name) for index in indexes):
+            self.refresh_pages()
+            return
+        self._pages_checked = time.time()  # One background rescan at a time
+        _build_executor.submit(self.refresh_pages)
+
+    def refresh_pages(self):
+        """Rescan the folder and re-index the page text of the page indexes that are out of date"""
+        indexes = self.page_indexes()
+        if not indexes or not os.path.exists(self.contracts_dir):
+            return
+        with self._pages_lock:
+            files = scan_file_state(self.contracts_dir)
+            stale = [index for index in indexes if not index.is_current(self.name, files)]
+            if stale:
+                self._index_pages(load_documents(self.contracts_dir, self.name), files, stale)
+            self._pages_checked = time.time()
+
+    def _index_pages(self, documents: List[Document], files: Dict, indexes: List = None,
+                     changed: List[str] = None):
+        """Store the page text and classified clauses of this corpus, or only of the ``changed`` files"""
+        with self._pages_lock:
+            for index in self.page_indexes() if indexes is None else indexes:
+                try:
+                    if isinstance(index, ClauseIndex):
+                        rows = extract_clauses(documents, self.contracts_dir)
+                        print(f"Classified {len(rows)} clauses for '{self.name}'")
+                    else:
+                        rows = [(os.path.relpath(doc.metadata['source'], self.contracts_dir),
+                                 doc.metadata.get('page', 0), doc.page_content) for doc in documents]
+                        print(f"Full-text indexed {len(rows)} pages for '{self.name}'")
+                    index.replace_files(self.name, rows, files=changed, state=files)
+                except Exception as e:
+                    print(f"Error updating {type(index).__name__} for '{self.name}': {str(e)}")
+            self._pages_checked = time.time()
+
+    def _create_vectorstore(self, splits: List[Document], files: Dict):
+        embeddings = create_embeddings(self.options['embedding'])
+        if self.options['backend'] == 'numpy':
+            return NumpyVectorIndex.from_documents(
+                splits,
+                embeddings,
+                path=self.index_path,
+                dtype=self.options['dtype'],
+                manifest={
+                    'corpus': self.name,
+                    'embedding': self.options['embedding'],
+                    'files': files,
+                    'file_hashes': hash_files(self.contracts_dir, files)
+                }
+            )
+        return Chroma.from_documents(
+            splits,
+            embeddings,
+            collection_name=f"{self.collection_name}_{int(time.time() * 1000)}"
+        )
+
+    def build(self, force: bool = True) -> bool:
+        """(Re)build this shard; queries keep using the old index until the swap"""
+        with profile_block('ingest'), self._build_lock, self._index_lock():
+            if not force:
+                self._refresh()
+                if self.vectorstore is not None or self._open_existing():
+                    return True  # Built by a concurrent caller or worker while we waited, or opened from disk
+
+            print(f"\n=== Building index shard '{self.name}' ===")
+            print(f"Looking for contracts in: {self.contracts_dir}")
+
+            if not os.path.exists(self.contracts_dir):
+                self.last_error = f"Contracts directory does not exist: {self.contracts_dir}"
+                print(f"Error: {self.last_error}")
+                return False
+
+            files = scan_file_state(self.contracts_dir)
+            documents = load_documents(self.contracts_dir, self.name)
+            self._index_pages(documents, files)
+            if not documents:
+                self.last_error = "No documents were loaded"
+                print(f"No documents were loaded for shard '{self.name}'!")
+                return False
+
+            try:
+                splits = split_documents(documents)
+                print(f"Split into {len(splits)} chunks")
+                if not splits:
+                    self.last_error = "No text chunks were created"
+                    return False
+
+                print("Creating embeddings...")
+                old_vectorstore = self.vectorstore
+                vectorstore = self._create_vectorstore(splits, files)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error building shard '{self.name}': {str(e)}")
+                return False
+
+            self.vectorstore = vectorstore
+            self.file_count = len({doc.metadata.get('source') for doc in documents})
+            self.chunk_count = len(splits)
+            self.built_at = time.time()
+            self.last_error = None
+
+            if isinstance(old_vectorstore, Chroma):
+                try:
+                    old_vectorstore.delete_collection()
+                except Exception as e:
+                    print(f"Error dropping old collection for '{self.name}': {str(e)}")
+
+            print(f"Shard '{self.name}' ready: {self.file_count} files, {self.chunk_count} chunks")
+            return True
+
+    def export_snapshot(self, out: IO[bytes], base_header: Optional[Dict] = None) -> Dict:
+        """Write this shard's index as a snapshot, or as a delta against ``base_header``"""
+        if self.options['backend'] != 'numpy':
+            raise ValueError("Snapshots need the numpy vector backend (VECTOR_BACKEND=numpy)")
+        if not self.build(force=False):
+            raise ValueError(self.last_error or f"Index for '{self.name}' is not available")
+        return write_snapshot(self.vectorstore, self.contracts_dir, out, base_header)
+
+    def import_snapshot(self, stream: IO[bytes]) -> Dict:
+        """Load a snapshot into this shard, then index only the files that differ locally"""
+        if self.options['backend'] != 'numpy':
+            raise ValueError("Snapshots need the numpy vector backend (VECTOR_BACKEND=numpy)")
+        if not os.path.exists(self.contracts_dir):
+            raise ValueError(f"Contracts directory does not exist: {self.contracts_dir}")
+        with self._build_lock, self._index_lock():
+            summary = apply_snapshot(stream, self.index_path, self.options, self.contracts_dir, self.name)
+            if not self._open_existing():
+                raise ValueError(f"Imported index for '{self.name}' could not be opened")
+        summary['chunk_count'] = self.chunk_count
+        return summary
+
+    def search(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        self._refresh()
+        vectorstore = self.vectorstore
+        if vectorstore is None:
+            return []
+        if not filter:
+            return vectorstore.similarity_search_with_relevance_scores(query, k=k)
+        if isinstance(vectorstore, Chroma):
+            filter = to_chroma_filter(filter)
+        return vectorstore.similarity_search_with_relevance_scores(query, k=k, filter=filter)
+
+    def info(self) -> Dict:
+        return {
+            'name': self.name,
+            'contracts_dir': self.contracts_dir,
+            'ready': self.vectorstore is not None,
+            'file_count': self.file_count,
+            'chunk_count': self.chunk_count,
+            'built_at': self.built_at,
+            'backend': self.options['backend'],
+            'embedding_provider': self.options['embedding']['provider'],
+            'error': self.last_error
+        }
+
+class ShardManager:
+    """Keeps one independently built index shard per named corpus"""
+
+    def __init__(self):
+        self.shards: Dict[str, IndexShard] = {}
+        self._lock = threading.Lock()
+        self._retained = None
+
+    def configure(self, corpora: Dict[str, str], options: Dict = None):
+        """Sync shards with the configured corpora; only new, moved or re-backed corpora are reset"""
+        options = dict(DEFAULT_INDEX_OPTIONS, **(options or {}))
+        with self._lock:
+            for name in list(self.shards):
+                if name not in corpora:
+                    del self.shards[name]
+            for name, contracts_dir in corpora.items():
+                shard = self.shards.get(name)
+                if shard is None or shard.contracts_dir != contracts_dir or shard.options != options:
+                    self.shards[name] = IndexShard(name, contracts_dir, options)
+
+            # Drop the page-index rows of removed corpora, once per change of the corpus list
+            retained = (tuple(sorted(corpora)), options['fulltext_db'], options['clause_db'])
+            if retained != self._retained:
+                for index_class, db_path in ((FullTextIndex, options['fulltext_db']), (ClauseIndex, options['clause_db'])):
+                    if db_path:
+                        try:
+                            index_class.open(db_path).retain_corpora(list(corpora))
+                        except Exception as e:
+                            print(f"Error pruning {index_class.__name__}: {str(e)}")
+                self._retained = retained
+
+    def get(self, name: str) -> Optional[IndexShard]:
+        with self._lock:
+            return self.shards.get(name)
+
+    def ensure_pages(self, names: List[str]):
+        """Fill the page indexes (full-text, clauses) of the named corpora without embedding anything"""
+        for name in names:
+            shard = self.get(name)
+            if shard is not None:
+                shard.ensure_pages()
+
+    def ensure_built(self, names: List[str]) -> List[str]:
+        """Build any of the named shards that are not ready yet, in parallel"""
+        pending = [self.shards[name] for name in names
+                   if name in self.shards and self.shards[name].vectorstore is None]
+        if len(pending) == 1:
+            pending[0].build(force=False)  # Stay on the calling thread, so profiles include the build
+        else:
+            list(_build_executor.map(_with_app_context(lambda shard: shard.build(force=False)), pending))
+        return [name for name in names if name in self.shards and self.shards[name].vectorstore is not None]
+
+    def rebuild(self, names: List[str]) -> Dict[str, bool]:
+        shards = [self.shards[name] for name in names if name in self.shards]
+        if len(shards) == 1:
+            return {shards[0].name: shards[0].build()}
+        results = _build_executor.map(_with_app_context(lambda shard: shard.build()), shards)
+        return {shard.name: ok for shard, ok in zip(shards, results)}
+
+    def search(self, query: str, names: List[str], k: int,
+               filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Query several shards in parallel and merge their results into one top-k"""
+        shards = [self.shards[name] for name in names if name in self.shards]
+        if len(shards) == 1:
+            return shards[0].search(query, k, filter)
+
+        merged = []
+        for results in _query_executor.map(lambda shard: shard.search(query, k, filter), shards):
+            merged.extend(results)
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return merged[:k]
+
+    def info(self) -> List[Dict]:
+        with self._lock:
+            return [shard.info() for shard in self.shards.values()]
+
+class ShardSet:
+    """Search source over a selection of shards, usable by the context packer"""
+
+    def __init__(self, manager: ShardManager, names: List[str], filter: Optional[Dict[str, Any]] = None):
+        self.manager = manager
+        self.names = names
+        self.filter = filter
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.manager.search(query, self.names, k, self.filter)
+
+shard_manager = ShardManager()
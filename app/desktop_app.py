@@ -1,8 +1,9 @@
 import sys
 import os
+import json
 from PySide6.QtWidgets import (QApplication, QMainWindow, QFileDialog, 
                               QPushButton, QVBoxLayout, QWidget, QLabel)
-from PySide6.QtCore import QUrl, QTimer, QObject, Slot, Property, Qt
+from PySide6.QtCore import QUrl, QObject, Slot, Signal, Property, Qt, QRunnable, QThreadPool
 from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
@@ -10,22 +11,82 @@ from PySide6.QtWebChannel import QWebChannel
 from app.config_manager import ConfigManager
 from flask import Flask
 from threading import Thread
-from app.routes import main as main_blueprint
+from werkzeug.serving import make_server
+from app.routes import (main as main_blueprint, answer_question, compute_dashboard_stats,
+                        get_settings_info, reload_documents, validate_corpora)
+from app.corpora import DEFAULT_CORPUS
+from config import Config
+
+class BridgeTask(QRunnable):
+    """Runs one bridge call on the worker pool inside the Flask app context"""
+    def __init__(self, bridge, request_id, func, *args):
+        super().__init__()
+        self.bridge = bridge
+        self.request_id = request_id
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            with self.bridge.flask_app.app_context():
+                result = self.func(*self.args)
+            payload = result[0] if isinstance(result, tuple) else result
+        except Exception as e:
+            print(f"Error in bridge call: {str(e)}")
+            payload = {'error': str(e)}
+        self.bridge.resultReady.emit(self.request_id, json.dumps(payload))
 
 class Bridge(QObject):
-    def __init__(self, window):
+    """Exposes the app's operations to the page over QWebChannel.
+
+    Each slot queues the work on a thread pool and returns at once; the
+    JSON result is delivered through ``resultReady`` with the caller's id.
+    """
+    resultReady = Signal(str, str)
+
+    def __init__(self, window, flask_app):
         super().__init__()
         self._window = window
+        self.flask_app = flask_app
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(4)
+
+    def submit(self, request_id, func, *args):
+        self.pool.start(BridgeTask(self, request_id, func, *args))
 
     @Slot()
     def openFolderDialog(self):
         self._window.handle_folder_change()
 
+    @Slot(str, str, str)
+    def ask(self, request_id, question, corpora_json):
+        def run():
+            return answer_question(question.strip(), validate_corpora(json.loads(corpora_json or '[]')))
+        self.submit(request_id, run)
+
+    @Slot(str, str)
+    def dashboardStats(self, request_id, corpora_json):
+        def run():
+            return compute_dashboard_stats(validate_corpora(json.loads(corpora_json or '[]')))
+        self.submit(request_id, run)
+
+    @Slot(str)
+    def settingsInfo(self, request_id):
+        self.submit(request_id, get_settings_info)
+
+    @Slot(str, str)
+    def reloadDocs(self, request_id, corpora_json):
+        def run():
+            return reload_documents(validate_corpora(json.loads(corpora_json or '[]')))
+        self.submit(request_id, run)
+
 class MainWindow(QMainWindow):
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, flask_app, port):
         super().__init__()
         self.config_manager = config_manager
-        self.bridge = Bridge(self)
+        self.flask_app = flask_app
+        self.port = port
+        self.bridge = Bridge(self, flask_app)
         
         # Add shortcut for DevTools
         self.web_view = None  # Will be set in setup_ui
@@ -65,6 +126,7 @@ class MainWindow(QMainWindow):
         inject_script = """
             new QWebChannel(qt.webChannelTransport, function(channel) {
                 window.bridge = channel.objects.bridge;
+                window.dispatchEvent(new Event('bridgeready'));
             });
         """
         
@@ -75,8 +137,8 @@ class MainWindow(QMainWindow):
             self.show_setup_page()
             return
         
-        # If setup is complete, show main page
-        QTimer.singleShot(1000, lambda: self.web_view.setUrl(QUrl("http://127.0.0.1:5000")))
+        # If setup is complete, show main page (the server is already listening)
+        self.web_view.setUrl(QUrl(f"http://127.0.0.1:{self.port}"))
         layout.addWidget(self.web_view)
 
     def show_setup_page(self):
@@ -126,14 +188,10 @@ class MainWindow(QMainWindow):
         if folder:
             # Update configs
             self.config_manager.set_contracts_dir(folder)
-            from flask import current_app
-            current_app.config['CONTRACTS_DIR'] = folder
+            self.flask_app.config['CONTRACTS_DIR'] = folder
             
-            # Force reload of documents
-            from app.routes import initialize_document_chain
-            global qa_chain
-            qa_chain = None
-            qa_chain = initialize_document_chain()
+            # Re-index only the default corpus, off the UI thread
+            self.bridge.submit('', reload_documents, [DEFAULT_CORPUS])
             
             # Reload the UI
             self.setup_ui()
@@ -146,8 +204,12 @@ def create_app():
     
     config_manager = ConfigManager()
     
+    # Start from the shared defaults (QA tuning, etc.)
+    flask_app.config.from_object(Config)
+    
     # Set the contracts directory in Flask config
     flask_app.config['CONTRACTS_DIR'] = config_manager.get_contracts_dir()
+    flask_app.config['CORPORA'] = config_manager.get_corpora()
     
     # Remove the SERVER_NAME line and just keep APPLICATION_ROOT
     flask_app.config['APPLICATION_ROOT'] = '/'
@@ -158,23 +220,29 @@ def create_app():
     return flask_app, config_manager
 
 def run_flask(app):
-    """Run Flask in a separate thread"""
-    app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
+    """Serve pages and contract files on a free loopback port; returns the port.
+
+    Queries, dashboard and settings go through the Qt bridge, so this server
+    only delivers the page itself and /view_contract files.
+    """
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    flask_thread = Thread(target=server.serve_forever)
+    flask_thread.daemon = True
+    flask_thread.start()
+    return server.server_port
 
 def main():
     # Create Flask app and config manager
     flask_app, config_manager = create_app()
     
     # Start Flask in a separate thread
-    flask_thread = Thread(target=run_flask, args=(flask_app,))
-    flask_thread.daemon = True
-    flask_thread.start()
+    port = run_flask(flask_app)
     
     # Create Qt application
     qt_app = QApplication(sys.argv)
     
     # Create and show main window
-    window = MainWindow(config_manager)
+    window = MainWindow(config_manager, flask_app, port)
     window.show()
     
     # Start Qt application
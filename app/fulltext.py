@@ -0,0 +1,71 @@
+import html
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from app.sqlite_index import SQLiteCorpusIndex
+
+# Markers put around matches by snippet(), swapped for <mark> after HTML-escaping
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    body,
+    corpus UNINDEXED,
+    file UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+class FullTextIndex(SQLiteCorpusIndex):
+    """Page-level SQLite FTS5 index over the contracts of all corpora.
+
+    Rows are (file, page, text) tuples. Queries use FTS5 syntax: "exact
+    phrase", prefix*, AND / OR / NOT and NEAR(). Results are ranked by
+    bm25 and carry highlighted snippets.
+    """
+    SCHEMA = _SCHEMA
+    TABLE = 'pages'
+    INSERT = "INSERT INTO pages (body, corpus, file, page) VALUES (?, ?, ?, ?)"
+
+    def _insert_params(self, corpus: str, row: Tuple) -> Tuple:
+        file, page, text = row
+        return (text, corpus, file, page)
+
+    def search(self, query: str, corpora: Optional[List[str]] = None,
+               page: int = 1, per_page: int = 20) -> Dict:
+        """Run a ranked full-text query, returning one page of results and the total hit count"""
+        where = "pages MATCH ?"
+        params = [query]
+        if corpora:
+            where += f" AND corpus IN ({', '.join('?' for _ in corpora)})"
+            params.extend(corpora)
+
+        conn = self._connect()
+        try:
+            total = conn.execute(f"SELECT count(*) FROM pages WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"""SELECT corpus, file, page, bm25(pages) AS score,
+                           snippet(pages, 0, '{_MATCH_START}', '{_MATCH_END}', '…', 16)
+                    FROM pages WHERE {where}
+                    ORDER BY score LIMIT ? OFFSET ?""",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # FTS5 reports malformed queries (unbalanced quotes, bare operators) this way
+            raise ValueError(f"Invalid search query: {str(e)}")
+        finally:
+            conn.close()
+
+        results = []
+        for corpus, file, page_number, score, snippet in rows:
+            snippet = html.escape(snippet).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')
+            results.append({
+                'corpus': corpus,
+                'file': file,
+                'page': int(page_number) + 1,
+                'score': round(-score, 4),
+                'snippet': snippet
+            })
+        return {'total': total, 'page': page, 'per_page': per_page, 'results': results}
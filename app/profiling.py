@@ -0,0 +1,132 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from flask import current_app, has_app_context, has_request_context, request
+
+PROFILE_HEADER = 'X-Profile'
+
+# cProfile allows one active profiler per interpreter (enforced on Python 3.12+), so
+# only one call is profiled at a time; concurrent and nested calls run unprofiled
+_profiler_lock = threading.Lock()
+
+def should_profile() -> bool:
+    """Decide whether the current call is profiled; cheap when profiling is off"""
+    if _profiler_lock.locked() or not has_app_context():
+        return False
+    config = current_app.config
+    if has_request_context() and config.get('PROFILING_ALLOW_HEADER') and request.headers.get(PROFILE_HEADER) == '1':
+        return True
+    if not config.get('PROFILING_ENABLED'):
+        return False
+    return random.random() < config.get('PROFILING_SAMPLE_RATE', 1.0)
+
+@contextmanager
+def profile_block(name: str):
+    """Profile the enclosed block with cProfile if profiling is selected for it"""
+    if not should_profile():
+        yield
+        return
+
+    profile_dir = current_app.config['PROFILE_DIR']
+    max_files = current_app.config.get('PROFILE_MAX_FILES', 50)
+    label = f"{request.method} {request.path}" if has_request_context() else name
+
+    if not _profiler_lock.acquire(blocking=False):
+        yield  # Another call is being profiled
+        return
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler (e.g. a debugger's) is already active
+            print(f"Could not start profiler for {name}: {str(e)}")
+            profiler = None
+        started = time.time()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                try:
+                    save_profile(profiler, name, label, time.time() - started, profile_dir, max_files)
+                except Exception as e:
+                    print(f"Error saving profile for {name}: {str(e)}")
+    finally:
+        _profiler_lock.release()
+
+def profiled(name: str):
+    """Decorator form of ``profile_block``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_block(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def save_profile(profiler: cProfile.Profile, name: str, label: str, elapsed: float,
+                 profile_dir: str, max_files: int) -> str:
+    """Write a .prof file plus a small JSON sidecar, keeping only the newest ``max_files``"""
+    os.makedirs(profile_dir, exist_ok=True)
+    now = time.time()  # One reading, so ids sort in time order across second boundaries
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}-{name}-{threading.get_ident()}"
+    path = os.path.join(profile_dir, f"{profile_id}.prof")
+    profiler.dump_stats(path)
+    with open(os.path.join(profile_dir, f"{profile_id}.json"), 'w') as f:
+        json.dump({'id': profile_id, 'name': name, 'label': label,
+                   'elapsed': elapsed, 'created': time.time()}, f)
+    print(f"Saved profile {profile_id} ({elapsed:.3f}s)")
+
+    profiles = sorted(f for f in os.listdir(profile_dir) if f.endswith('.prof'))
+    for old in profiles[:-max_files] if max_files else []:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(profile_dir, old[:-len('.prof')] + suffix))
+            except OSError:
+                pass
+    return path
+
+def top_functions(path: str, top_n: int = 15, sort_by: str = 'cumulative') -> List[Dict]:
+    """Get the hottest functions of a saved profile"""
+    stats = pstats.Stats(path)
+    stats.sort_stats(sort_by)
+    hottest = []
+    for func in stats.fcn_list[:top_n]:
+        primitive_calls, total_calls, total_time, cumulative_time, _ = stats.stats[func]
+        filename, line, function = func
+        hottest.append({
+            'function': f"{function} ({os.path.basename(filename)}:{line})",
+            'calls': total_calls,
+            'total_time': round(total_time, 6),
+            'cumulative_time': round(cumulative_time, 6)
+        })
+    return hottest
+
+def list_profiles(profile_dir: str, limit: int = 10, top_n: int = 15, sort_by: str = 'cumulative') -> List[Dict]:
+    """List the most recent profiles, newest first, with their top-N hottest functions"""
+    if not os.path.exists(profile_dir):
+        return []
+    profiles = sorted((f for f in os.listdir(profile_dir) if f.endswith('.prof')), reverse=True)[:limit]
+    results = []
+    for file in profiles:
+        profile_id = file[:-len('.prof')]
+        meta_path = os.path.join(profile_dir, f"{profile_id}.json")
+        meta = {'id': profile_id}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        try:
+            meta['top_functions'] = top_functions(os.path.join(profile_dir, file), top_n, sort_by)
+        except Exception as e:
+            meta['error'] = str(e)
+        results.append(meta)
+    return results
@@ -0,0 +1,192 @@
+import re
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_community.chat_models import ChatOpenAI
+from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+
+# Provider registries, keyed by the name used in EMBEDDING_PROVIDER / LLM_PROVIDER
+EMBEDDING_PROVIDERS = {}
+LLM_PROVIDERS = {}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def _check_provider(cls, base):
+    """Reject incomplete providers at registration rather than on their first request"""
+    if not issubclass(cls, base):
+        raise TypeError(f"{cls.__name__} must subclass {base.__name__}")
+    if not cls.name:
+        raise TypeError(f"{cls.__name__} has no provider name")
+    if cls.__abstractmethods__:
+        raise TypeError(f"{cls.__name__} does not implement: {', '.join(sorted(cls.__abstractmethods__))}")
+
+def register_embedding_provider(cls):
+    """Register an embedding provider class under its ``name``"""
+    _check_provider(cls, EmbeddingProvider)
+    EMBEDDING_PROVIDERS[cls.name] = cls
+    return cls
+
+def register_llm_provider(cls):
+    """Register an LLM provider class under its ``name``"""
+    _check_provider(cls, LLMProvider)
+    LLM_PROVIDERS[cls.name] = cls
+    return cls
+
+class EmbeddingProvider(ABC):
+    """Base class for embedding providers.
+
+    ``settings`` reads everything that affects the vectors from the app config,
+    including the embedding ``dimension``. Indexes store these settings and
+    are only rebuilt when they change.
+    """
+    name = None
+
+    @classmethod
+    @abstractmethod
+    def settings(cls, config) -> Dict:
+        """Read the embedding settings, including ``dimension``, from the app config"""
+
+    @classmethod
+    @abstractmethod
+    def create(cls, settings: Dict) -> Embeddings:
+        """Create the embedder for the given settings"""
+
+class LLMProvider(ABC):
+    """Base class for LLM providers"""
+    name = None
+
+    @classmethod
+    @abstractmethod
+    def create(cls, config):
+        """Create the LLM from the app config"""
+
+@register_embedding_provider
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = 'openai'
+    DIMENSIONS = {
+        'text-embedding-ada-002': 1536,
+        'text-embedding-3-small': 1536,
+        'text-embedding-3-large': 3072
+    }
+
+    @classmethod
+    def settings(cls, config) -> Dict:
+        model = config.get('OPENAI_EMBEDDING_MODEL', 'text-embedding-ada-002')
+        return {'model': model, 'dimension': cls.DIMENSIONS.get(model, 1536)}
+
+    @classmethod
+    def create(cls, settings: Dict) -> Embeddings:
+        return OpenAIEmbeddings(model=settings['model'])
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8'))
+
+class HashingEmbeddings(Embeddings):
+    """Local embedder: signed feature hashing of word unigrams and bigrams.
+
+    Needs no model files or network access. Term counts are log-scaled and
+    the vectors L2-normalized, so dot products are cosine similarities.
+    """
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        if features:
+            hashes = np.fromiter((_hash_feature(f) for f in features), dtype=np.uint64, count=len(features))
+            signs = np.where(hashes & np.uint64(1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, (hashes % np.uint64(self.dimension)).astype(np.int64), signs)
+            vector = np.sign(vector) * np.log1p(np.abs(vector))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+@register_embedding_provider
+class HashingEmbeddingProvider(EmbeddingProvider):
+    name = 'hashing'
+
+    @classmethod
+    def settings(cls, config) -> Dict:
+        return {'dimension': int(config.get('HASHING_EMBEDDING_DIM', 768))}
+
+    @classmethod
+    def create(cls, settings: Dict) -> Embeddings:
+        return HashingEmbeddings(dimension=settings['dimension'])
+
+@register_llm_provider
+class OpenAIChatProvider(LLMProvider):
+    name = 'openai'
+
+    @classmethod
+    def create(cls, config):
+        return ChatOpenAI(temperature=0, model_name=config.get('LLM_MODEL', 'gpt-4'))
+
+class ExtractiveLLM(LLM):
+    """Offline stand-in LLM that answers with the context sentences closest to the question"""
+    max_sentences: int = 3
+
+    @property
+    def _llm_type(self) -> str:
+        return 'extractive'
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        question_match = re.search(r"Question:(.*?)(?:Context:|$)", prompt, re.S)
+        context_match = re.search(r"Context:(.*?)(?:Answer:|$)", prompt, re.S)
+        question = question_match.group(1) if question_match else prompt
+        context = context_match.group(1) if context_match else prompt
+
+        question_terms = set(_TOKEN_RE.findall(question.lower()))
+        sentences = [s.strip() for s in _SENTENCE_RE.split(context) if s.strip()]
+        scored = [(len(question_terms & set(_TOKEN_RE.findall(s.lower()))), i, s) for i, s in enumerate(sentences)]
+        best = sorted(scored, key=lambda item: (-item[0], item[1]))[:self.max_sentences]
+        best = [item for item in sorted(best, key=lambda item: item[1]) if item[0] > 0]
+        if not best:
+            return "I could not find this in the provided contracts."
+        return ' '.join(sentence for _, _, sentence in best)
+
+@register_llm_provider
+class ExtractiveLLMProvider(LLMProvider):
+    name = 'extractive'
+
+    @classmethod
+    def create(cls, config):
+        return ExtractiveLLM(max_sentences=int(config.get('EXTRACTIVE_LLM_SENTENCES', 3)))
+
+def get_embedding_settings(config) -> Dict:
+    """Resolve the configured embedding provider into its settings, including the provider name"""
+    name = config.get('EMBEDDING_PROVIDER', 'openai')
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'; available: {', '.join(EMBEDDING_PROVIDERS)}")
+    settings = EMBEDDING_PROVIDERS[name].settings(config)
+    settings['provider'] = name
+    return settings
+
+def create_embeddings(settings: Dict) -> Embeddings:
+    """Build the Embeddings object described by ``get_embedding_settings``"""
+    return EMBEDDING_PROVIDERS[settings['provider']].create(settings)
+
+def create_llm(config):
+    """Build the configured LLM"""
+    name = config.get('LLM_PROVIDER', 'openai')
+    if name not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}'; available: {', '.join(LLM_PROVIDERS)}")
+    return LLM_PROVIDERS[name].create(config)
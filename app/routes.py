@@ -1,92 +1,89 @@
 from flask import Blueprint, render_template, jsonify, request, current_app, send_file, redirect, url_for, send_from_directory
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.chat_models import ChatOpenAI
 from langchain.chains import ConversationalRetrievalChain
 from langchain.docstore.document import Document
 import os
 import mimetypes
+import tempfile
 from app.config_manager import ConfigManager
+from app.context_packer import PackedContextRetriever, get_last_pack_stats
+from app.corpora import DEFAULT_CORPUS, ShardSet, shard_manager, classify_contract_type
+from app.vector_index import FILTER_FIELDS
+from app.providers import create_llm, get_embedding_settings
+from app.profiling import profiled, list_profiles
+from app.fulltext import FullTextIndex
+from app.clauses import CLAUSE_TYPES, ClauseIndex
+from app.snapshots import SNAPSHOT_EXTENSION
+import html
 from typing import List, Dict
 import re
 from langchain.prompts import PromptTemplate
 
 main = Blueprint('main', __name__)
 
-# Initialize the QA chain
+# QA chain over all corpora
 qa_chain = None
 
-def initialize_document_chain():
+def get_corpora() -> Dict[str, str]:
+    """Get the configured corpora, with CONTRACTS_DIR as the default corpus"""
+    corpora = dict(current_app.config.get('CORPORA') or {})
+    if DEFAULT_CORPUS not in corpora and current_app.config.get('CONTRACTS_DIR'):
+        corpora[DEFAULT_CORPUS] = current_app.config['CONTRACTS_DIR']
+    return corpora
+
+def get_corpus_dir(name: str = None) -> str:
+    """Get the folder of a corpus, falling back to the default corpus"""
+    return get_corpora().get(name or DEFAULT_CORPUS, current_app.config['CONTRACTS_DIR'])
+
+def configure_shards():
+    """Sync the index shards with the configured corpora and vector backend"""
+    shard_manager.configure(get_corpora(), {
+        'backend': current_app.config['VECTOR_BACKEND'],
+        'dtype': current_app.config['VECTOR_DTYPE'],
+        'index_dir': current_app.config['INDEX_DIR'],
+        'fulltext_db': current_app.config['FULLTEXT_DB'],
+        'clause_db': current_app.config['CLAUSE_DB'],
+        'pages_check_interval': current_app.config['PAGES_CHECK_INTERVAL'],
+        'embedding': get_embedding_settings(current_app.config)
+    })
+
+@profiled('initialize_document_chain')
+def initialize_document_chain(corpora: List[str] = None, metadata_filter: Dict = None):
     """Initialize the document processing and QA chain"""
     print("\n=== Initializing Document Chain ===")
     
-    contracts_dir = current_app.config['CONTRACTS_DIR']
-    print(f"Looking for contracts in: {contracts_dir}")
-    
-    if not os.path.exists(contracts_dir):
-        print(f"Error: Contracts directory does not exist: {contracts_dir}")
-        return None
-    
-    documents = []
-    file_count = 0
+    configured = get_corpora()
+    configure_shards()
+    names = [name for name in (corpora or configured) if name in configured]
+    print(f"Using corpora: {names}")
     
-    # Process each file based on its type
-    for root, _, files in os.walk(contracts_dir):
-        print(f"\nScanning directory: {root}")
-        pdf_files = [f for f in files if f.lower().endswith('.pdf')]
-        print(f"Found PDF files: {pdf_files}")
-        file_count = len(pdf_files)
-        
-        for file in pdf_files:
-            file_path = os.path.join(root, file)
-            try:
-                print(f"\nLoading PDF file: {file}")
-                loader = PyMuPDFLoader(file_path)
-                docs = loader.load()
-                print(f"Loaded {len(docs)} pages from {file}")
-                for doc in docs:
-                    doc.metadata['title'] = file  # Add file name to metadata
-                documents.extend(docs)
-                print(f"Successfully loaded PDF: {file}")
-            except Exception as e:
-                print(f"Error loading {file}: {str(e)}")
-    
-    if not documents:
+    # Only shards that were never built are indexed here
+    ready = shard_manager.ensure_built(names)
+    if not ready:
         print("No documents were loaded!")
         return None
-        
-    print(f"\nTotal files found: {file_count}")
-    print(f"Total documents loaded: {len(documents)}")
+    
+    for name in ready:
+        info = shard_manager.get(name).info()
+        print(f"Corpus '{name}': {info['file_count']} files, {info['chunk_count']} chunks")
     
     try:
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        splits = text_splitter.split_documents(documents)
-        print(f"Split into {len(splits)} chunks")
-        
-        if not splits:
-            print("No text chunks were created!")
-            return None
-        
-        # Create embeddings and vector store
-        print("Creating embeddings...")
-        embeddings = OpenAIEmbeddings()
-        vectorstore = Chroma.from_documents(splits, embeddings)
-        
         # Create QA chain with specific prompt
         print("Creating QA chain...")
-        llm = ChatOpenAI(temperature=0, model_name="gpt-4")
+        llm = create_llm(current_app.config)
+        
+        # Pack retrieved chunks into a token budget instead of sending a fixed top-k
+        retriever = PackedContextRetriever(
+            source=ShardSet(shard_manager, ready, metadata_filter),
+            fetch_k=current_app.config['CONTEXT_FETCH_K'],
+            token_budget=current_app.config['CONTEXT_TOKEN_BUDGET'],
+            mmr_lambda=current_app.config['CONTEXT_MMR_LAMBDA'],
+            redundancy_threshold=current_app.config['CONTEXT_REDUNDANCY_THRESHOLD']
+        )
         
         # Create the chain with a specific prompt
         qa_chain = ConversationalRetrievalChain.from_llm(
             llm,
-            vectorstore.as_retriever(search_kwargs={"k": 10}),  # Increase number of retrieved documents
+            retriever,
             return_source_documents=True,
             verbose=True,
             combine_docs_chain_kwargs={
@@ -122,6 +119,74 @@ def initialize_document_chain():
         print(f"Error in chain initialization: {str(e)}")
         return None
 
+def get_qa_chain(corpora: List[str] = None, metadata_filter: Dict = None):
+    """Get the QA chain for the selected corpora, initializing it if needed"""
+    global qa_chain
+    if corpora or metadata_filter:
+        return initialize_document_chain(corpora, metadata_filter)
+    if qa_chain is None:
+        print("Initializing QA chain...")
+        qa_chain = initialize_document_chain()
+    return qa_chain
+
+def validate_corpora(requested) -> List[str]:
+    """Normalize a corpus selection (list or comma-separated), raising ValueError for unknown names"""
+    if isinstance(requested, str):
+        requested = [name.strip() for name in requested.split(',') if name.strip()]
+    requested = requested or []
+    if not isinstance(requested, list) or not all(isinstance(name, str) for name in requested):
+        raise ValueError("corpora must be a list of names")
+    unknown = [name for name in requested if name not in get_corpora()]
+    if unknown:
+        raise ValueError(f"Unknown corpora: {', '.join(unknown)}")
+    return requested
+
+def validate_filter(metadata_filter) -> Dict:
+    """Check a metadata pre-filter, raising ValueError for unsupported fields"""
+    metadata_filter = metadata_filter or {}
+    if not isinstance(metadata_filter, dict):
+        raise ValueError("filter must be an object")
+    unsupported = [field for field in metadata_filter if field not in FILTER_FIELDS]
+    if unsupported:
+        raise ValueError(f"Cannot filter on: {', '.join(unsupported)}")
+    return metadata_filter
+
+def get_request_data() -> Dict:
+    """Read the JSON body of the request, raising ValueError unless it is an object"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    return data
+
+def get_requested_corpora() -> List[str]:
+    """Read the corpora selected by the request"""
+    return validate_corpora(get_request_data().get('corpora') or request.args.get('corpora', ''))
+
+def get_requested_filter() -> Dict:
+    """Read the metadata pre-filter of the request"""
+    return validate_filter(get_request_data().get('filter'))
+
+def list_contract_files(corpora: List[str] = None) -> List[Dict]:
+    """List the PDF contracts at the top level of each selected corpus folder"""
+    files = []
+    for name, contracts_dir in get_corpora().items():
+        if corpora and name not in corpora:
+            continue
+        if not os.path.exists(contracts_dir):
+            continue
+        for file in os.listdir(contracts_dir):
+            if file.lower().endswith('.pdf'):
+                files.append({'corpus': name, 'file': file, 'url': contract_url(file, name)})
+    return files
+
+def contract_url(rel_path: str, corpus: str = DEFAULT_CORPUS) -> str:
+    """Build the /view_contract link for a file in a corpus"""
+    if corpus == DEFAULT_CORPUS:
+        return f'/view_contract/{rel_path}'
+    return f'/view_contract/{rel_path}?corpus={corpus}'
+
 def format_table_response(answer: str) -> str:
     """Format the response as an HTML table if it contains tabular data"""
     if '|' not in answer:
@@ -146,6 +211,25 @@ def format_table_response(answer: str) -> str:
     html.append('</tbody></table>')
     return '\n'.join(html)
 
+def build_comparison_table(contracts: List[tuple], clause_types: List[str], clauses: Dict) -> str:
+    """Render clauses side by side: one row per clause type, one column per contract"""
+    html_rows = ['<table class="comparison-table">', '<thead><tr><th>Clause</th>']
+    html_rows.extend(f'<th>{html.escape(file)}</th>' for _, file in contracts)
+    html_rows.append('</tr></thead><tbody>')
+    for clause_type in clause_types:
+        html_rows.append(f'<tr><td>{html.escape(clause_type.replace("_", " ").title())}</td>')
+        for contract in contracts:
+            found = clauses[contract][clause_type]
+            if found:
+                clause = found[0]
+                cell = f'{html.escape(clause["heading"])} (p. {clause["page"]}): {html.escape(clause["text"][:400])}'
+            else:
+                cell = 'Not found'
+            html_rows.append(f'<td>{cell}</td>')
+        html_rows.append('</tr>')
+    html_rows.append('</tbody></table>')
+    return '\n'.join(html_rows)
+
 def extract_company_names(contracts_dir: str) -> set:
     """Dynamically extract company names from contract filenames"""
     company_names = set()
@@ -245,7 +329,7 @@ def home():
 def view_contract(filename):
     """Serve contract files"""
     try:
-        contracts_dir = current_app.config['CONTRACTS_DIR']
+        contracts_dir = get_corpus_dir(request.args.get('corpus'))
         file_path = os.path.join(contracts_dir, filename)
         
         # Get the file's MIME type
@@ -261,50 +345,43 @@ def view_contract(filename):
     except Exception as e:
         return f"Error accessing file: {str(e)}", 404
 
-@main.route('/ask', methods=['POST'])
-def ask():
-    global qa_chain
-    
+@profiled('ask')
+def answer_question(question: str, corpora: List[str] = None, metadata_filter: Dict = None):
+    """Answer a question over the selected corpora; returns (payload, status)"""
     try:
-        print("\n=== Processing Question ===")
-        data = request.get_json()
-        question = data.get('query', '').strip()
-        print(f"Question received: {question}")
-        
         if not question:
-            return jsonify({'error': 'No question provided'}), 400
+            return {'error': 'No question provided'}, 400
             
         # Get actual file count
-        contracts_dir = current_app.config['CONTRACTS_DIR']
-        actual_file_count = sum(1 for f in os.listdir(contracts_dir) if f.lower().endswith('.pdf'))
+        contract_files = list_contract_files(corpora)
+        actual_file_count = len(contract_files)
         print(f"Actual number of PDF files: {actual_file_count}")
         
         # If asking about number of contracts, return direct count
         if any(phrase in question.lower() for phrase in ['how many', 'number of']):
             answer = f"You have {actual_file_count} contracts in your folder."
             sources = []
-            for file in os.listdir(contracts_dir):
-                if file.lower().endswith('.pdf'):
-                    sources.append({
-                        'file': file,
-                        'url': f'/view_contract/{file}',
-                        'page': 'N/A'
-                    })
-            return jsonify({
+            for contract in contract_files:
+                sources.append({
+                    'file': contract['file'],
+                    'url': contract['url'],
+                    'page': 'N/A'
+                })
+            return {
                 'message': answer,
                 'sources': sources
-            })
+            }, 200
         
         # For other questions, use the QA chain
-        if qa_chain is None:
-            print("Initializing QA chain...")
-            qa_chain = initialize_document_chain()
-            if qa_chain is None:
-                return jsonify({'error': 'Failed to initialize QA chain. No documents found.'}), 500
+        chain = get_qa_chain(corpora, metadata_filter)
+        if chain is None:
+            return {'error': 'Failed to initialize QA chain. No documents found.'}, 500
         
         # Get response from QA chain
         print("Getting response from QA chain...")
-        result = qa_chain({"question": question, "chat_history": []})
+        result = chain({"question": question, "chat_history": []})
+        context_stats = get_last_pack_stats()
+        print(f"Context stats: {context_stats}")
         
         # Format response with source documents
         answer = result.get('answer', '')
@@ -323,16 +400,19 @@ def ask():
             for doc in result['source_documents']:
                 try:
                     abs_path = doc.metadata.get('source', 'Unknown')
-                    rel_path = os.path.relpath(abs_path, current_app.config['CONTRACTS_DIR'])
+                    corpus = doc.metadata.get('corpus', DEFAULT_CORPUS)
+                    rel_path = os.path.relpath(abs_path, get_corpus_dir(corpus))
                     
                     # Only add if we haven't seen this path before
-                    if rel_path not in seen_paths:
-                        seen_paths.add(rel_path)
+                    if (corpus, rel_path) not in seen_paths:
+                        seen_paths.add((corpus, rel_path))
                         source = {
                             'file': rel_path,
-                            'url': f'/view_contract/{rel_path}',
+                            'url': contract_url(rel_path, corpus),
                             'page': doc.metadata.get('page', 'N/A')
                         }
+                        if corpus != DEFAULT_CORPUS:
+                            source['corpus'] = corpus
                         sources.append(source)
                         print(f"Added source: {rel_path}")
                 except Exception as e:
@@ -342,34 +422,157 @@ def ask():
         filtered_sources = filter_relevant_sources(sources, question, answer)
         print(f"Filtered sources: {filtered_sources}")
         
-        return jsonify({
+        return {
             'message': formatted_answer,
-            'sources': filtered_sources
-        })
+            'sources': filtered_sources,
+            'context_stats': context_stats
+        }, 200
         
     except Exception as e:
         print(f"Error occurred: {str(e)}")
         import traceback
         print(traceback.format_exc())
+        return {'error': str(e)}, 500
+
+@main.route('/ask', methods=['POST'])
+def ask():
+    print("\n=== Processing Question ===")
+    try:
+        question = get_request_data().get('query') or ''
+        if not isinstance(question, str):
+            raise ValueError("query must be a string")
+        question = question.strip()
+        print(f"Question received: {question}")
+        
+        corpora = get_requested_corpora()
+        metadata_filter = get_requested_filter()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    payload, status = answer_question(question, corpora, metadata_filter)
+    return jsonify(payload), status
+
+@main.route('/search')
+def search_contracts():
+    """Keyword search over the page text of all contracts, without the LLM"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'No search query provided'}), 400
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = min(100, max(1, request.args.get('per_page', 20, type=int)))
+        
+        try:
+            corpora = get_requested_corpora() or list(get_corpora())
+            configure_shards()
+            shard_manager.ensure_pages(corpora)
+            results = FullTextIndex.open(current_app.config['FULLTEXT_DB']).search(query, corpora, page, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        for result in results['results']:
+            result['url'] = f"{contract_url(result['file'], result['corpus'])}#page={result['page']}"
+        return jsonify(results)
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/compare/clause_types')
+def get_clause_types():
+    """List the clause types and the contracts in the clause index"""
+    try:
+        configure_shards()
+        shard_manager.ensure_pages(list(get_corpora()))
+        return jsonify({
+            'clause_types': list(CLAUSE_TYPES),
+            'contracts': ClauseIndex.open(current_app.config['CLAUSE_DB']).contracts()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/compare', methods=['POST'])
+def compare_contracts():
+    """Compare clauses across contracts from the clause index, optionally summarized in one LLM call"""
+    try:
+        try:
+            data = get_request_data()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        entries = data.get('contracts') or []
+        clause_types = data.get('clause_types') or list(CLAUSE_TYPES)
+        if not isinstance(entries, list) or not isinstance(clause_types, list):
+            return jsonify({'error': 'contracts and clause_types must be lists'}), 400
+        
+        contracts = []
+        for contract in entries:
+            if isinstance(contract, str):
+                contract = {'file': contract}
+            if not isinstance(contract, dict) or not isinstance(contract.get('file'), str) \
+                    or not isinstance(contract.get('corpus', DEFAULT_CORPUS), str):
+                return jsonify({'error': 'Each contract must be a file name or an object with a file name'}), 400
+            contracts.append((contract.get('corpus', DEFAULT_CORPUS), contract['file']))
+        
+        if not contracts:
+            return jsonify({'error': 'No contracts provided'}), 400
+        unknown = [t for t in clause_types if t not in CLAUSE_TYPES]
+        if unknown:
+            return jsonify({'error': f"Unknown clause types: {', '.join(unknown)}"}), 400
+        unknown = sorted({corpus for corpus, _ in contracts if corpus not in get_corpora()})
+        if unknown:
+            return jsonify({'error': f"Unknown corpora: {', '.join(unknown)}"}), 400
+        
+        # Clauses are classified from page text; no embeddings are needed
+        configure_shards()
+        shard_manager.ensure_pages(sorted({corpus for corpus, _ in contracts}))
+        
+        clauses = ClauseIndex.open(current_app.config['CLAUSE_DB']).lookup(contracts, clause_types)
+        response = {
+            'clause_types': clause_types,
+            'contracts': [{'corpus': corpus, 'file': file, 'url': contract_url(file, corpus),
+                           'clauses': clauses[(corpus, file)]} for corpus, file in contracts],
+            'table': build_comparison_table(contracts, clause_types, clauses)
+        }
+        
+        if data.get('summarize'):
+            sections = []
+            for clause_type in clause_types:
+                sections.append(f"## {clause_type.replace('_', ' ').title()}")
+                for corpus, file in contracts:
+                    found = clauses[(corpus, file)][clause_type]
+                    text = ' '.join(c['text'] for c in found)[:1500] if found else 'Not found'
+                    sections.append(f"[{file}] {text}")
+            prompt = ("Compare the following contract clauses. Answer strictly from the text given. "
+                      "Present the key differences as a table with a header row, using | to separate "
+                      "columns: Clause | " + ' | '.join(file for _, file in contracts) + "\n\n" +
+                      '\n'.join(sections))
+            result = create_llm(current_app.config).invoke(prompt)
+            response['summary'] = format_table_response(getattr(result, 'content', result))
+        
+        return jsonify(response)
+    except Exception as e:
+        print(f"Error comparing contracts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def get_settings_info() -> Dict:
+    """Get the contracts folder and the number of documents in it"""
+    config_manager = ConfigManager()
+    contracts_dir = config_manager.get_contracts_dir()
+    
+    # Count documents in the directory
+    doc_count = 0
+    if os.path.exists(contracts_dir):
+        for root, _, files in os.walk(contracts_dir):
+            doc_count += sum(1 for f in files if f.lower().endswith(('.pdf', '.txt')))
+    
+    return {
+        'contracts_dir': contracts_dir,
+        'doc_count': doc_count
+    }
+
 @main.route('/settings/info')
 def settings_info():
     """Get current settings information"""
     try:
-        config_manager = ConfigManager()
-        contracts_dir = config_manager.get_contracts_dir()
-        
-        # Count documents in the directory
-        doc_count = 0
-        if os.path.exists(contracts_dir):
-            for root, _, files in os.walk(contracts_dir):
-                doc_count += sum(1 for f in files if f.lower().endswith(('.pdf', '.txt')))
-        
-        return jsonify({
-            'contracts_dir': contracts_dir,
-            'doc_count': doc_count
-        })
+        return jsonify(get_settings_info())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -383,22 +586,142 @@ def change_folder():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def reload_documents(corpora: List[str] = None) -> Dict:
+    """Rebuild the shards of the selected corpora, or of all corpora"""
+    global qa_chain
+    configure_shards()
+    results = shard_manager.rebuild(corpora or list(get_corpora()))
+    qa_chain = None  # Include shards that were not ready before
+    return {'success': all(results.values()), 'corpora': results}
+
 @main.route('/settings/reload_docs', methods=['POST'])
 def reload_docs():
-    """Reload all documents"""
+    """Reload documents, optionally only for the selected corpora"""
+    try:
+        try:
+            corpora = get_requested_corpora()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(reload_documents(corpora))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/corpora')
+def list_corpora():
+    """List the configured corpora and the state of their index shards"""
+    try:
+        configure_shards()
+        return jsonify({'corpora': shard_manager.info()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/corpora', methods=['POST'])
+def add_corpus():
+    """Add a named corpus; its shard is indexed on first use"""
     try:
+        try:
+            data = get_request_data()
+            name, path = data.get('name') or '', data.get('path') or ''
+            if not isinstance(name, str) or not isinstance(path, str):
+                raise ValueError("name and path must be strings")
+            name, path = name.strip(), path.strip()
+            if not name or not path:
+                raise ValueError("Both name and path are required")
+            if ',' in name:
+                raise ValueError("Corpus names cannot contain ','")
+            if not os.path.isdir(path):
+                raise ValueError(f"Folder does not exist: {path}")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        ConfigManager().add_corpus(name, path)
+        corpora = dict(current_app.config.get('CORPORA') or {})
+        corpora[name] = path
+        current_app.config['CORPORA'] = corpora
+        configure_shards()
+        
         global qa_chain
-        qa_chain = None  # Force reinitialization
-        qa_chain = initialize_document_chain()
+        qa_chain = None  # The all-corpora chain now includes the new shard
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@main.route('/dashboard/stats')
-def get_dashboard_stats():
-    """Get statistics for the dashboard"""
+@main.route('/corpora/<name>/reload', methods=['POST'])
+def reload_corpus(name):
+    """Rebuild the index shard of a single corpus"""
+    try:
+        if name not in get_corpora():
+            return jsonify({'error': f'Unknown corpus: {name}'}), 404
+        configure_shards()
+        results = shard_manager.rebuild([name])
+        
+        global qa_chain
+        qa_chain = None  # Include the shard if it was not ready before
+        return jsonify({'success': results.get(name, False), 'corpus': shard_manager.get(name).info()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/corpora/<name>', methods=['DELETE'])
+def remove_corpus(name):
+    """Remove a named corpus; its page-index rows are dropped and its folder is left alone"""
+    try:
+        if name not in get_corpora():
+            return jsonify({'error': f'Unknown corpus: {name}'}), 404
+        if name == DEFAULT_CORPUS:
+            return jsonify({'error': 'The default corpus cannot be removed'}), 400
+        
+        ConfigManager().remove_corpus(name)
+        corpora = dict(current_app.config.get('CORPORA') or {})
+        corpora.pop(name, None)
+        current_app.config['CORPORA'] = corpora
+        configure_shards()
+        
+        global qa_chain
+        qa_chain = None
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/corpora/<name>/snapshot')
+def export_corpus_snapshot(name):
+    """Download a full index snapshot of a corpus for loading on other installs"""
+    try:
+        if name not in get_corpora():
+            return jsonify({'error': f'Unknown corpus: {name}'}), 404
+        configure_shards()
+        out = tempfile.TemporaryFile()
+        header = shard_manager.get(name).export_snapshot(out)
+        out.seek(0)
+        return send_file(out, mimetype='application/gzip', as_attachment=True,
+                         download_name=f"{name}-{header['id'][:12]}{SNAPSHOT_EXTENSION}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/corpora/<name>/snapshot', methods=['POST'])
+def import_corpus_snapshot(name):
+    """Load a full or delta snapshot (raw body or 'file' upload) into a corpus, streaming"""
+    try:
+        if name not in get_corpora():
+            return jsonify({'error': f'Unknown corpus: {name}'}), 404
+        configure_shards()
+        stream = request.files['file'].stream if 'file' in request.files else request.stream
+        summary = shard_manager.get(name).import_snapshot(stream)
+        
+        global qa_chain
+        qa_chain = None
+        return jsonify({'success': True, 'snapshot': summary, 'corpus': shard_manager.get(name).info()})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiled('dashboard_stats')
+def compute_dashboard_stats(corpora: List[str] = None):
+    """Compute the dashboard statistics; returns (payload, status)"""
     try:
-        contracts_dir = current_app.config['CONTRACTS_DIR']
         stats = {
             'total_contracts': 0,
             'contract_types': {},
@@ -410,12 +733,12 @@ def get_dashboard_stats():
         }
         
         # Initialize QA chain if needed
-        global qa_chain
-        if qa_chain is None:
-            qa_chain = initialize_document_chain()
+        chain = get_qa_chain(corpora)
+        if chain is None:
+            return {'error': 'Failed to initialize QA chain. No documents found.'}, 500
         
         # Get contract information using QA chain
-        result = qa_chain({
+        result = chain({
             "question": """List all contracts with their expiration dates in a table format. 
                           Include header row and use | as separator.
                           Format: Contract Name | Expiration Date
@@ -477,25 +800,51 @@ def get_dashboard_stats():
         stats['expiration_timeline'].sort(key=lambda x: x['timestamp'])
         
         # Count total contracts
-        stats['total_contracts'] = sum(1 for f in os.listdir(contracts_dir) 
-                                     if f.lower().endswith('.pdf'))
+        contract_files = list_contract_files(corpora)
+        stats['total_contracts'] = len(contract_files)
         
         # Process contract types
-        for filename in os.listdir(contracts_dir):
-            if filename.lower().endswith('.pdf'):
-                contract_type = 'Other'
-                if 'partnership' in filename.lower():
-                    contract_type = 'Partnership Agreement'
-                elif 'nda' in filename.lower() or 'disclosure' in filename.lower():
-                    contract_type = 'Non-Disclosure Agreement'
-                
-                stats['contract_types'][contract_type] = stats['contract_types'].get(contract_type, 0) + 1
-        
-        return jsonify(stats)
+        for contract in contract_files:
+            contract_type = classify_contract_type(contract['file'])
+            stats['contract_types'][contract_type] = stats['contract_types'].get(contract_type, 0) + 1
+        
+        return stats, 200
     except Exception as e:
         print(f"Error getting dashboard stats: {str(e)}")
+        return {'error': str(e)}, 500
+
+@main.route('/dashboard/stats')
+def get_dashboard_stats():
+    """Get statistics for the dashboard"""
+    try:
+        corpora = get_requested_corpora()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    payload, status = compute_dashboard_stats(corpora)
+    return jsonify(payload), status
+
+@main.route('/profiles')
+def get_profiles():
+    """List recent profiles with their hottest functions"""
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        top_n = request.args.get('top', 15, type=int)
+        sort_by = request.args.get('sort', 'cumulative')
+        if sort_by not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'error': f'Unsupported sort: {sort_by}'}), 400
+        return jsonify({
+            'enabled': bool(current_app.config.get('PROFILING_ENABLED')),
+            'profiles': list_profiles(current_app.config['PROFILE_DIR'], limit, top_n, sort_by)
+        })
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/profiles/<profile_id>')
+def download_profile(profile_id):
+    """Download a raw .prof file for snakeviz/pstats"""
+    return send_from_directory(current_app.config['PROFILE_DIR'], f"{profile_id}.prof", as_attachment=True)
+
 @main.route('/static/<path:filename>')
 def serve_static(filename):
     return send_from_directory('static', filename)
\ No newline at end of file
@@ -0,0 +1,246 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import PurePath
+from typing import IO, Dict, List, Optional
+
+import numpy as np
+from app.providers import create_embeddings
+from app.vector_index import NumpyVectorIndex
+
+SNAPSHOT_FORMAT = 'contractqa-snapshot'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = '.cqsnap'
+
+# Metadata fields holding absolute paths; snapshots store them relative to the contracts folder
+_PATH_FIELDS = ('source', 'file_path')
+
+# Largest embedding dimension accepted from a snapshot header
+MAX_SNAPSHOT_DIM = 8192
+
+# Header fields an imported snapshot must carry
+_HEADER_FIELDS = ('kind', 'id', 'base', 'embedding', 'dim', 'chunks', 'files', 'state', 'changed', 'deleted')
+
+def file_key(path: str, contracts_dir: str) -> str:
+    """Path of a file relative to its contracts folder in POSIX form, so keys match across platforms"""
+    return PurePath(os.path.relpath(path, contracts_dir)).as_posix()
+
+def key_path(contracts_dir: str, file: str) -> str:
+    """Local path of a file key from ``file_key``"""
+    return os.path.join(contracts_dir, *file.split('/'))
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_files(contracts_dir: str, files: Dict[str, List], known_state: Optional[Dict] = None,
+               known_hashes: Optional[Dict] = None) -> Dict[str, str]:
+    """Content hashes of scanned files; files whose size and mtime are unchanged keep their known hash"""
+    known_state, known_hashes = known_state or {}, known_hashes or {}
+    hashes = {}
+    for file, state in files.items():
+        if known_state.get(file) == state and file in known_hashes:
+            hashes[file] = known_hashes[file]
+        else:
+            hashes[file] = file_sha256(key_path(contracts_dir, file))
+    return hashes
+
+def snapshot_id(embedding: Dict, file_hashes: Dict[str, str]) -> str:
+    """Identify an index state by its embedding settings and file contents"""
+    state = json.dumps({'embedding': embedding, 'files': file_hashes}, sort_keys=True)
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()[:32]
+
+def read_header(stream: IO[bytes]) -> Dict:
+    """Read only the header of a snapshot, e.g. to use it as the base of a delta"""
+    try:
+        with gzip.GzipFile(fileobj=stream, mode='rb') as f:
+            return _check_header(json.loads(f.readline()))
+    except (OSError, EOFError) as e:
+        raise ValueError(f"Unreadable snapshot: {str(e)}")
+
+def _check_header(header: Dict) -> Dict:
+    if header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError("Not an index snapshot")
+    if header.get('version', 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {header['version']} is newer than this app supports ({SNAPSHOT_VERSION})")
+    return header
+
+def write_snapshot(index: NumpyVectorIndex, contracts_dir: str, out: IO[bytes],
+                   base_header: Optional[Dict] = None) -> Dict:
+    """Write an index as a gzip-compressed JSON-lines snapshot.
+
+    The stream is a header line (format version, provider metadata and the
+    content hash of every file), one line per chunk with its text, metadata
+    and float16 embedding, and a footer with the chunk count and a SHA-256
+    of everything before it. With ``base_header`` only the files added or
+    changed since that snapshot are written, plus the list of deletions.
+    """
+    manifest = index.manifest
+    if 'file_hashes' not in manifest:
+        raise ValueError("Index has no file hashes; rebuild it before exporting")
+    embedding, hashes = manifest['embedding'], manifest['file_hashes']
+
+    if base_header is None:
+        changed, deleted = sorted(hashes), []
+    else:
+        if base_header['embedding'] != embedding:
+            raise ValueError("Base snapshot was built with another embedding provider")
+        changed = sorted(file for file, digest in hashes.items() if base_header['files'].get(file) != digest)
+        deleted = sorted(file for file in base_header['files'] if file not in hashes)
+
+    wanted = set(changed)
+    rows, chunks = [], []
+    for row, (text, metadata) in enumerate(index.records()):
+        file = file_key(metadata['source'], contracts_dir)
+        if file in wanted:
+            metadata = dict(metadata, **{field: file for field in _PATH_FIELDS if field in metadata})
+            rows.append(row)
+            chunks.append({'file': file, 'text': text, 'metadata': metadata})
+    vectors = index.stored_vectors(np.asarray(rows)).astype(np.float16) if rows else None
+
+    header = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'kind': 'full' if base_header is None else 'delta',
+        'id': snapshot_id(embedding, hashes),
+        'base': None if base_header is None else base_header['id'],
+        'created': time.time(),
+        'corpus': manifest.get('corpus'),
+        'embedding': embedding,
+        'dim': manifest['dim'],
+        'chunks': len(chunks),
+        'files': hashes,
+        'state': manifest.get('files', {}),
+        'changed': changed,
+        'deleted': deleted
+    }
+
+    checksum = hashlib.sha256()
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        def write_line(value):
+            line = json.dumps(value).encode('utf-8') + b'\n'
+            checksum.update(line)
+            f.write(line)
+
+        write_line(header)
+        for chunk, vector in zip(chunks, vectors if vectors is not None else []):
+            chunk['vector'] = base64.b64encode(vector.tobytes()).decode('ascii')
+            write_line(chunk)
+        f.write(json.dumps({'end': True, 'chunks': len(chunks), 'sha256': checksum.hexdigest()}).encode('utf-8') + b'\n')
+
+    print(f"Exported {header['kind']} snapshot {header['id']}: {len(changed)} files, "
+          f"{len(chunks)} chunks, {len(deleted)} deletions")
+    return header
+
+def _read_snapshot(stream: IO[bytes], embedding: Dict, contracts_dir: str, corpus: str):
+    """Decode a snapshot line by line, verifying its checksum before anything is returned"""
+    try:
+        return _decode_snapshot(stream, embedding, contracts_dir, corpus)
+    except (OSError, EOFError) as e:
+        # Bad gzip data or a stream cut off mid-member
+        raise ValueError(f"Unreadable snapshot: {str(e)}")
+    except (KeyError, TypeError, AttributeError) as e:
+        # A line without the fields or types a snapshot has
+        raise ValueError(f"Malformed snapshot: {type(e).__name__} {str(e)}")
+
+def _decode_snapshot(stream: IO[bytes], embedding: Dict, contracts_dir: str, corpus: str):
+    checksum = hashlib.sha256()
+    with gzip.GzipFile(fileobj=stream, mode='rb') as f:
+        line = f.readline()
+        checksum.update(line)
+        header = _check_header(json.loads(line))
+        missing = [field for field in _HEADER_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"Snapshot header lacks: {', '.join(missing)}")
+        if header['embedding'] != embedding:
+            raise ValueError(f"Snapshot was built with embedding provider {header['embedding']}, "
+                             f"this app uses {embedding}")
+        dim = header['dim']
+        if not isinstance(dim, int) or not 0 < dim <= MAX_SNAPSHOT_DIM or not isinstance(header['chunks'], int):
+            raise ValueError(f"Snapshot declares an invalid shape: {header['chunks']} x {dim}")
+        if not isinstance(header['files'], dict) or not isinstance(header['state'], dict) \
+                or any(file not in header['files'] for file in header['changed']):
+            raise ValueError("Snapshot header lists changed files without hashes")
+
+        # Rows are collected as they arrive rather than allocated from the unverified header
+        records, vectors = [], []
+        footer = None
+        for line in f:
+            value = json.loads(line)
+            if value.get('end'):
+                footer = value
+                break
+            checksum.update(line)
+            if len(records) >= header['chunks']:
+                raise ValueError("Snapshot holds more chunks than its header declares")
+
+            vector = np.frombuffer(base64.b64decode(value['vector']), dtype=np.float16)
+            if len(vector) != dim:
+                raise ValueError(f"Snapshot vector has {len(vector)} dimensions, expected {dim}")
+            file_path = key_path(contracts_dir, value['file'])
+            metadata = dict(value['metadata'], corpus=corpus,
+                            **{field: file_path for field in _PATH_FIELDS if field in value['metadata']})
+            vectors.append(vector)
+            records.append((value['file'], value['text'], metadata))
+
+    if footer is None:
+        raise ValueError("Snapshot is truncated")
+    if footer['sha256'] != checksum.hexdigest() or footer['chunks'] != len(records) or len(records) != header['chunks']:
+        raise ValueError("Snapshot checksum mismatch")
+    vectors = np.vstack(vectors).astype(np.float32) if vectors else np.zeros((0, dim), dtype=np.float32)
+    return header, records, vectors
+
+def apply_snapshot(stream: IO[bytes], index_path: str, options: Dict, contracts_dir: str, corpus: str) -> Dict:
+    """Load a full or delta snapshot into the index at ``index_path``.
+
+    Nothing is written unless the whole stream decodes and its checksum
+    matches. A delta only applies on top of the snapshot it was made from.
+    The manifest keeps the snapshot's file state, so opening the shard
+    afterwards re-embeds only the files that differ locally.
+    """
+    header, records, vectors = _read_snapshot(stream, options['embedding'], contracts_dir, corpus)
+    embeddings = create_embeddings(options['embedding'])
+    texts = [text for _, text, _ in records]
+    metadatas = [metadata for _, _, metadata in records]
+
+    if header['kind'] == 'full':
+        NumpyVectorIndex.from_vectors(texts, vectors, embeddings, metadatas, path=index_path,
+                                      dtype=options['dtype'], manifest={
+                                          'corpus': corpus,
+                                          'embedding': header['embedding'],
+                                          'files': header['state'],
+                                          'file_hashes': header['files'],
+                                          'snapshot_id': header['id']
+                                      })
+    else:
+        index = NumpyVectorIndex(index_path, embeddings) if NumpyVectorIndex.exists(index_path) else None
+        current = index.manifest.get('snapshot_id') if index is not None else None
+        if current != header['base']:
+            raise ValueError(f"Delta snapshot applies to {header['base']}, but the index is at {current or 'no snapshot'}")
+
+        replaced = set(header['changed']) | set(header['deleted'])
+        keep = np.asarray([file_key(metadata['source'], contracts_dir) not in replaced
+                           for _, metadata in index.records()], dtype=bool)
+        state = {file: value for file, value in index.manifest.get('files', {}).items() if file not in replaced}
+        hashes = {file: value for file, value in index.manifest.get('file_hashes', {}).items() if file not in replaced}
+        state.update({file: header['state'][file] for file in header['changed'] if file in header['state']})
+        hashes.update({file: header['files'][file] for file in header['changed']})
+        # Rows and file bookkeeping are published together in one generation
+        index.update(keep=keep, texts=texts, metadatas=metadatas, vectors=vectors if records else None,
+                     manifest={'files': state, 'file_hashes': hashes, 'snapshot_id': header['id']})
+
+    print(f"Imported {header['kind']} snapshot {header['id']} into '{corpus}': "
+          f"{len(header['changed'])} files, {len(records)} chunks, {len(header['deleted'])} deletions")
+    return {
+        'id': header['id'],
+        'kind': header['kind'],
+        'files': len(header['changed']),
+        'chunks': len(records),
+        'deleted': len(header['deleted'])
+    }
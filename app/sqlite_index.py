@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_CORPUS_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS corpus_state (
+    corpus TEXT PRIMARY KEY,
+    files TEXT NOT NULL
+);
+"""
+
+# Long-lived instances per (class, database), so the schema is only set up once per process
+_instances = {}
+_instances_lock = threading.Lock()
+
+class SQLiteCorpusIndex:
+    """Base for SQLite indexes whose rows belong to a corpus and a contract file.
+
+    Subclasses set ``SCHEMA`` (creating ``TABLE`` with corpus and file
+    columns) and ``INSERT``, and map their rows to its parameters in
+    ``_insert_params``. The ``corpus_state`` table records which folder
+    state each corpus was indexed from.
+    """
+    SCHEMA = None
+    TABLE = None
+    INSERT = None
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, db_path: str) -> 'SQLiteCorpusIndex':
+        """Get the shared instance for a database"""
+        key = (cls, os.path.abspath(db_path))
+        with _instances_lock:
+            if key not in _instances:
+                _instances[key] = cls(db_path)
+            return _instances[key]
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._schema_ready:
+            with self._schema_lock:
+                conn.executescript(self.SCHEMA + _CORPUS_STATE_SCHEMA)
+                conn.execute('PRAGMA journal_mode=WAL')
+                self._schema_ready = True
+        return conn
+
+    def _insert_params(self, corpus: str, row: Tuple) -> Tuple:
+        return (corpus,) + tuple(row)
+
+    def replace_files(self, corpus: str, rows: Iterable[Tuple], files: Optional[List[str]] = None,
+                      state: Optional[Dict] = None):
+        """Replace the rows of a corpus, or only of ``files`` when given.
+
+        ``state`` records the folder state the index now reflects (see ``is_current``).
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                if files is None:
+                    conn.execute(f"DELETE FROM {self.TABLE} WHERE corpus = ?", (corpus,))
+                else:
+                    conn.executemany(f"DELETE FROM {self.TABLE} WHERE corpus = ? AND file = ?",
+                                     [(corpus, file) for file in files])
+                conn.executemany(self.INSERT, (self._insert_params(corpus, row) for row in rows))
+                if state is not None:
+                    conn.execute("INSERT OR REPLACE INTO corpus_state (corpus, files) VALUES (?, ?)",
+                                 (corpus, json.dumps(state, sort_keys=True)))
+        finally:
+            conn.close()
+
+    def has_corpus(self, corpus: str) -> bool:
+        """Check whether the corpus was indexed at all, whatever the folder state"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT 1 FROM corpus_state WHERE corpus = ?", (corpus,)).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+    def is_current(self, corpus: str, state: Dict) -> bool:
+        """Check whether the corpus was indexed from the given folder state"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT files FROM corpus_state WHERE corpus = ?", (corpus,)).fetchone()
+        finally:
+            conn.close()
+        return row is not None and row[0] == json.dumps(state, sort_keys=True)
+
+    def retain_corpora(self, corpora: List[str]):
+        """Delete the rows of every corpus not in ``corpora``"""
+        placeholders = ', '.join('?' for _ in corpora) or "''"
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"DELETE FROM {self.TABLE} WHERE corpus NOT IN ({placeholders})", list(corpora))
+                conn.execute(f"DELETE FROM corpus_state WHERE corpus NOT IN ({placeholders})", list(corpora))
+        finally:
+            conn.close()
@@ -0,0 +1,393 @@
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+INDEX_FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ('float16', 'int8')
+
+# Metadata fields stored as integer code columns so searches can pre-filter on them
+FILTER_FIELDS = ('source', 'title', 'contract_type')
+
+# Rows scored per block, so float16/int8 matrices are upcast a slice at a time
+_BLOCK_ROWS = 65536
+
+# Index directories whose lock the current thread holds, so nested writes don't deadlock
+_held_locks = threading.local()
+
+@contextmanager
+def index_lock(path: str):
+    """Exclusive lock on an index directory across threads and processes; re-entrant per thread"""
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    key = os.path.abspath(path)
+    if key in held:
+        yield
+        return
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'LOCK'), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _generation_time(name: str) -> Optional[int]:
+    try:
+        return int(name[1:]) if name.startswith('g') else None
+    except ValueError:
+        return None
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Quantize unit vectors to float16, or to int8 with one scale per row"""
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unsupported index dtype: {dtype}")
+
+class NumpyVectorIndex(VectorStore):
+    """Brute-force vector store over a quantized, memory-mapped embedding matrix.
+
+    The index lives in a directory holding the embedding matrix, the chunk
+    records and a manifest. Opening it only maps the files, so it is ready
+    immediately and worker processes share one page-cache copy. Every write
+    goes to a new generation subdirectory and then flips the CURRENT pointer;
+    a published generation is never modified, so readers holding the old maps
+    are never disturbed. Writers hold an
+    exclusive lock on the directory, so several worker processes can share it.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        self.path = path
+        self._embedding = embedding
+        self.manifest = {}
+        self._data_dir = None
+        self._vectors = None
+        self._scales = None
+        self._record_bytes = None
+        self._record_offsets = None
+        self._codes = {}
+        self._pointer_stamp = None
+        if self.exists(path):
+            self._open()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, 'CURRENT'))
+
+    def is_stale(self) -> bool:
+        """Check whether another writer has made a newer generation current since this one was opened"""
+        try:
+            stat = os.stat(os.path.join(self.path, 'CURRENT'))
+        except OSError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != self._pointer_stamp
+
+    def _open(self):
+        stat = os.stat(os.path.join(self.path, 'CURRENT'))
+        with open(os.path.join(self.path, 'CURRENT')) as f:
+            data_dir = os.path.join(self.path, f.read().strip())
+        with open(os.path.join(data_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {self.path}")
+
+        vectors = np.load(os.path.join(data_dir, 'vectors.npy'), mmap_mode='r')
+        scales = None
+        if manifest['dtype'] == 'int8':
+            scales = np.load(os.path.join(data_dir, 'scales.npy'), mmap_mode='r')
+        record_offsets = np.load(os.path.join(data_dir, 'record_offsets.npy'), mmap_mode='r')
+        record_bytes = None
+        if os.path.getsize(os.path.join(data_dir, 'records.bin')):
+            record_bytes = np.memmap(os.path.join(data_dir, 'records.bin'), dtype=np.uint8, mode='r')
+        codes = {field: np.load(os.path.join(data_dir, f'{field}_codes.npy'), mmap_mode='r')
+                 for field in FILTER_FIELDS}
+
+        self._data_dir, self.manifest = data_dir, manifest
+        self._pointer_stamp = (stat.st_ino, stat.st_mtime_ns)
+        self._vectors, self._scales = vectors, scales
+        self._record_offsets, self._record_bytes, self._codes = record_offsets, record_bytes, codes
+
+    def _record(self, row: int) -> Tuple[str, Dict]:
+        start, end = self._record_offsets[row], self._record_offsets[row + 1]
+        record = json.loads(bytes(self._record_bytes[start:end]).decode('utf-8'))
+        return record['text'], record['metadata']
+
+    def records(self) -> Iterable[Tuple[str, Dict]]:
+        """Iterate over all stored (text, metadata) records in row order"""
+        for row in range(len(self)):
+            yield self._record(row)
+
+    def stored_vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the stored matrix, or only ``rows`` of it, dequantized to float32 unit vectors"""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        index = slice(None) if rows is None else rows
+        vectors = np.asarray(self._vectors[index], dtype=np.float32)
+        if self._scales is not None:
+            vectors = vectors * np.asarray(self._scales[index])[:, None]
+        return vectors
+
+    def _filter_rows(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Translate a metadata filter into the row numbers that match it"""
+        if not filter:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, wanted in filter.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on '{field}'; supported fields: {', '.join(FILTER_FIELDS)}")
+            values = self.manifest['fields'][field]
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            codes = [values.index(value) for value in wanted if value in values]
+            mask &= np.isin(self._codes[field], codes)
+        return np.flatnonzero(mask)
+
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        total = len(self) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, total)
+            index = slice(start, end) if rows is None else rows[start:end]
+            block = np.asarray(self._vectors[index], dtype=np.float32)
+            scores[start:end] = block @ query
+            if self._scales is not None:
+                scores[start:end] *= self._scales[index]
+        return scores
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict[str, Any]] = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        if not len(self):
+            return []
+        query = _normalize(np.asarray([embedding]))[0]
+        rows = self._filter_rows(filter)
+        if rows is not None and not len(rows):
+            return []
+
+        scores = self._score(query, rows)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            row = int(i) if rows is None else int(rows[i])
+            text, metadata = self._record(row)
+            results.append((Document(page_content=text, metadata=metadata), float(scores[i])))
+        return results
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine similarities of unit vectors
+        return lambda score: max(0.0, min(1.0, score))
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  **kwargs: Any) -> List[str]:
+        """Embed and append texts; the index files are rewritten without re-embedding old rows"""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32) if texts else None
+        return self.add_vectors(texts, metadatas, vectors, dtype=kwargs.get('dtype'))
+
+    def add_vectors(self, texts: List[str], metadatas: List[dict], vectors: Optional[np.ndarray],
+                    dtype: str = None) -> List[str]:
+        """Append precomputed embeddings to the index"""
+        first_row = len(self)
+        self.update(texts=texts, metadatas=metadatas, vectors=vectors, dtype=dtype)
+        return [str(row) for row in range(first_row, len(self))]
+
+    def keep_rows(self, keep: np.ndarray):
+        """Rewrite the index keeping only the rows where ``keep`` is true"""
+        self.update(keep=keep)
+
+    def update(self, keep: Optional[np.ndarray] = None, texts: List[str] = (), metadatas: List[dict] = (),
+               vectors: Optional[np.ndarray] = None, manifest: Optional[Dict] = None, dtype: str = None):
+        """Publish one generation with the ``keep`` rows, the appended vectors and the manifest values.
+
+        Kept rows are copied in their stored float16/int8 form; only the new
+        vectors are normalized and quantized.
+        """
+        dtype = dtype or self.manifest.get('dtype', 'float16')
+        rows = np.arange(len(self)) if keep is None else np.flatnonzero(np.asarray(keep, dtype=bool))
+        records = [self._record(int(row)) for row in rows] + list(zip(texts, metadatas))
+        parts = []
+        if len(rows):
+            if self.manifest.get('dtype') == dtype:
+                parts.append((self._vectors, self._scales, rows))
+            else:
+                parts.append(quantize(self.stored_vectors(rows), dtype) + (None,))
+        if vectors is not None and len(vectors):
+            parts.append(quantize(_normalize(vectors), dtype) + (None,))
+        self._write(records, parts, dtype, extra_manifest=manifest)
+
+    def _write(self, records: List[Tuple[str, Dict]],
+               parts: List[Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]], dtype: str,
+               extra_manifest: Optional[Dict] = None):
+        """Write a complete index as a new generation and make it current.
+
+        ``parts`` are (quantized vectors, scales, rows) sources in ``dtype``,
+        copied block by block in order; ``rows`` of None takes every row.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+        dim = int(parts[0][0].shape[1]) if parts else self.manifest.get('dim', 0)
+        total = sum(len(vectors) if rows is None else len(rows) for vectors, _, rows in parts)
+
+        with index_lock(self.path):
+            generation = f"g{time.time_ns()}"
+            staging = os.path.join(self.path, generation)
+            os.makedirs(staging)
+
+            out = np.lib.format.open_memmap(os.path.join(staging, 'vectors.npy'), mode='w+',
+                                            dtype=dtype, shape=(total, dim))
+            out_scales = None
+            if dtype == 'int8':
+                out_scales = np.lib.format.open_memmap(os.path.join(staging, 'scales.npy'), mode='w+',
+                                                       dtype=np.float32, shape=(total,))
+            position = 0
+            for vectors, scales, rows in parts:
+                count = len(vectors) if rows is None else len(rows)
+                for start in range(0, count, _BLOCK_ROWS):
+                    end = min(start + _BLOCK_ROWS, count)
+                    index = slice(start, end) if rows is None else rows[start:end]
+                    out[position + start:position + end] = vectors[index]
+                    if out_scales is not None:
+                        out_scales[position + start:position + end] = scales[index]
+                position += count
+            out.flush()
+            del out
+            if out_scales is not None:
+                out_scales.flush()
+                del out_scales
+
+            offsets = [0]
+            fields = {field: [] for field in FILTER_FIELDS}
+            lookup = {field: {} for field in FILTER_FIELDS}
+            codes = {field: [] for field in FILTER_FIELDS}
+            with open(os.path.join(staging, 'records.bin'), 'wb') as f:
+                for text, metadata in records:
+                    data = json.dumps({'text': text, 'metadata': metadata}).encode('utf-8')
+                    f.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                    for field in FILTER_FIELDS:
+                        value = metadata.get(field)
+                        if value not in lookup[field]:
+                            lookup[field][value] = len(fields[field])
+                            fields[field].append(value)
+                        codes[field].append(lookup[field][value])
+            np.save(os.path.join(staging, 'record_offsets.npy'), np.asarray(offsets, dtype=np.int64))
+            for field in FILTER_FIELDS:
+                np.save(os.path.join(staging, f'{field}_codes.npy'), np.asarray(codes[field], dtype=np.int32))
+
+            manifest = dict(self.manifest)
+            manifest.update(extra_manifest or {})
+            manifest.update({
+                'format_version': INDEX_FORMAT_VERSION,
+                'dtype': dtype,
+                'dim': dim,
+                'count': len(records),
+                'fields': fields
+            })
+            with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            replaced = None
+            if self.exists(self.path):
+                with open(os.path.join(self.path, 'CURRENT')) as f:
+                    replaced = f.read().strip()
+            pointer = os.path.join(self.path, 'CURRENT.tmp')
+            with open(pointer, 'w') as f:
+                f.write(generation)
+            os.replace(pointer, os.path.join(self.path, 'CURRENT'))
+            self._open()
+
+            # The replaced generation stays for workers that read the old pointer and are
+            # still opening it; older ones go (or, if still mapped on Windows, on a later write)
+            cutoff = _generation_time(replaced) if replaced else None
+            for entry in os.listdir(self.path):
+                created = _generation_time(entry)
+                if cutoff is not None and created is not None and created < cutoff:
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   path: str = None, dtype: str = 'float16', manifest: Optional[Dict] = None,
+                   **kwargs: Any) -> 'NumpyVectorIndex':
+        """Embed texts and write a fresh index at ``path``, replacing any existing one"""
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+        return cls.from_vectors(texts, vectors, embedding, metadatas, path=path, dtype=dtype, manifest=manifest)
+
+    @classmethod
+    def from_vectors(cls, texts: List[str], vectors: np.ndarray, embedding: Embeddings,
+                     metadatas: Optional[List[dict]] = None, path: str = None, dtype: str = 'float16',
+                     manifest: Optional[Dict] = None) -> 'NumpyVectorIndex':
+        """Write a fresh index at ``path`` from precomputed embeddings, replacing any existing one"""
+        if path is None:
+            raise ValueError("NumpyVectorIndex needs a path to store the index")
+        os.makedirs(path, exist_ok=True)
+        metadatas = metadatas or [{} for _ in texts]
+
+        index = cls(path, embedding)
+        index.manifest = {}
+        parts = [quantize(_normalize(vectors), dtype) + (None,)] if np.ndim(vectors) == 2 else []
+        index._write(list(zip(texts, metadatas)), parts, dtype, extra_manifest=manifest)
+        return index
@@ -7,7 +7,40 @@ load_dotenv()
 class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     CONTRACTS_DIR = os.path.join(BASE_DIR, 'contracts', 'samples')
+    # Extra named corpora as "name=/path,name=/path"; CONTRACTS_DIR is the 'default' corpus
+    CORPORA = dict(item.split('=', 1) for item in os.getenv('CORPORA', '').split(',') if '=' in item)
+
+    # Vector index: 'chroma' (in memory) or 'numpy' (quantized, memory-mapped files under INDEX_DIR)
+    VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'chroma')
+    VECTOR_DTYPE = os.getenv('VECTOR_DTYPE', 'float16')  # 'float16' or 'int8' for the numpy backend
+    INDEX_DIR = os.getenv('INDEX_DIR', os.path.join(os.path.expanduser('~'), '.contractqa', 'index'))
+    # SQLite FTS5 page index behind /search, filled during ingest
+    FULLTEXT_DB = os.getenv('FULLTEXT_DB', os.path.join(INDEX_DIR, 'fulltext.db'))
+    # Clauses classified by type at ingest, behind /compare
+    CLAUSE_DB = os.getenv('CLAUSE_DB', os.path.join(INDEX_DIR, 'clauses.db'))
+    # Seconds between background rescans of a corpus folder for the page indexes; queries never scan
+    PAGES_CHECK_INTERVAL = int(os.getenv('PAGES_CHECK_INTERVAL', 300))
+
+    # Providers: 'openai' or 'hashing' embeddings (local, offline); 'openai' or 'extractive' LLM (local stand-in)
+    EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+    OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-ada-002')
+    HASHING_EMBEDDING_DIM = int(os.getenv('HASHING_EMBEDDING_DIM', 768))
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4')
+
+    # Profiling of /ask, /dashboard/stats and index builds; send "X-Profile: 1" to profile one request
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 1.0))
+    PROFILING_ALLOW_HEADER = os.getenv('PROFILING_ALLOW_HEADER', 'true').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.expanduser('~'), '.contractqa', 'profiles'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
     SECRET_KEY = 'dev-key-please-change-in-production'
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     FLASK_DEBUG = True
+
+    # Context packing for the QA prompt
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))
+    CONTEXT_FETCH_K = int(os.getenv('CONTEXT_FETCH_K', 20))
+    CONTEXT_MMR_LAMBDA = float(os.getenv('CONTEXT_MMR_LAMBDA', 0.5))
+    CONTEXT_REDUNDANCY_THRESHOLD = float(os.getenv('CONTEXT_REDUNDANCY_THRESHOLD', 0.9))
     
\ No newline at end of file
@@ -0,0 +1,342 @@
+"""Concurrent HTTP load test for the contract assistant.
+
+Starts the app from create_app() on a free local port with the offline
+embedder and extractive LLM, both slowed down by a latency profile, then
+drives a weighted mix of /ask, /dashboard/stats, /settings/reload_docs and
+/view_contract requests from concurrent clients. Reports throughput,
+p50/p95/p99 latency and error rates per endpoint and concurrency level.
+
+    python loadtest.py --profile realistic --concurrency 1,4,16 --duration 30
+    python loadtest.py --mix ask=80,view=20 --requests 500 --max-p95 2.0 --json results.json
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.providers import (EmbeddingProvider, ExtractiveLLM, HashingEmbeddings, LLMProvider,
+                           register_embedding_provider, register_llm_provider)
+from config import Config
+
+# Simulated provider latency: milliseconds per embedding call and per LLM call, +/- jitter
+LATENCY_PROFILES = {
+    'none': {'embed_ms': 0, 'llm_ms': 0, 'jitter': 0.0},
+    'fast': {'embed_ms': 5, 'llm_ms': 100, 'jitter': 0.2},
+    'realistic': {'embed_ms': 50, 'llm_ms': 1500, 'jitter': 0.3},
+    'slow': {'embed_ms': 200, 'llm_ms': 6000, 'jitter': 0.5}
+}
+
+DEFAULT_MIX = 'ask=60,dashboard=15,view=20,reload=5'
+
+QUESTIONS = [
+    "What is the termination notice period?",
+    "What are the payment terms?",
+    "Who owns the intellectual property?",
+    "What is the governing law?",
+    "When does the agreement expire?",
+    "Is there a limitation of liability?",
+    "What are the confidentiality obligations?",
+    "How many contracts do I have?"
+]
+
+def _delay(latency_ms: float, jitter: float):
+    if latency_ms:
+        time.sleep(latency_ms / 1000.0 * random.uniform(1 - jitter, 1 + jitter))
+
+class DelayedEmbeddings(HashingEmbeddings):
+    """Hashing embeddings that take as long as a remote embedding call"""
+
+    def __init__(self, dimension: int, latency_ms: float, jitter: float):
+        super().__init__(dimension)
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        _delay(self.latency_ms, self.jitter)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        _delay(self.latency_ms, self.jitter)
+        return super().embed_query(text)
+
+@register_embedding_provider
+class LoadTestEmbeddingProvider(EmbeddingProvider):
+    name = 'loadtest'
+
+    @classmethod
+    def settings(cls, config) -> Dict:
+        return {
+            'dimension': int(config.get('HASHING_EMBEDDING_DIM', 768)),
+            'latency_ms': config.get('LOADTEST_EMBED_MS', 0),
+            'jitter': config.get('LOADTEST_JITTER', 0.0)
+        }
+
+    @classmethod
+    def create(cls, settings: Dict):
+        return DelayedEmbeddings(settings['dimension'], settings['latency_ms'], settings['jitter'])
+
+class DelayedExtractiveLLM(ExtractiveLLM):
+    """Extractive LLM that takes as long as a remote completion"""
+    latency_ms: float = 0.0
+    jitter: float = 0.0
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        _delay(self.latency_ms, self.jitter)
+        return super()._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+@register_llm_provider
+class LoadTestLLMProvider(LLMProvider):
+    name = 'loadtest'
+
+    @classmethod
+    def create(cls, config):
+        return DelayedExtractiveLLM(latency_ms=config.get('LOADTEST_LLM_MS', 0),
+                                    jitter=config.get('LOADTEST_JITTER', 0.0))
+
+def make_config(contracts_dir: str, work_dir: str, profile: Dict):
+    """App config pointing every index and provider at the load-test setup"""
+    class LoadTestConfig(Config):
+        CONTRACTS_DIR = contracts_dir
+        CORPORA = {}
+        VECTOR_BACKEND = 'numpy'
+        INDEX_DIR = os.path.join(work_dir, 'index')
+        FULLTEXT_DB = os.path.join(work_dir, 'index', 'fulltext.db')
+        CLAUSE_DB = os.path.join(work_dir, 'index', 'clauses.db')
+        PROFILE_DIR = os.path.join(work_dir, 'profiles')
+        PROFILING_ENABLED = False
+        EMBEDDING_PROVIDER = 'loadtest'
+        LLM_PROVIDER = 'loadtest'
+        LOADTEST_EMBED_MS = profile['embed_ms']
+        LOADTEST_LLM_MS = profile['llm_ms']
+        LOADTEST_JITTER = profile['jitter']
+    return LoadTestConfig
+
+def start_server(app):
+    """Serve the app on a free loopback port in a background thread; returns (server, port)"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, server.server_port
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse "ask=60,view=40" into endpoint weights"""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ('ask', 'dashboard', 'view', 'reload'):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def list_pdfs(contracts_dir: str) -> List[str]:
+    pdfs = []
+    for root, _, files in os.walk(contracts_dir):
+        pdfs.extend(os.path.relpath(os.path.join(root, f), contracts_dir) for f in files if f.lower().endswith('.pdf'))
+    return sorted(pdfs)
+
+def make_request(endpoint: str, rng: random.Random, pdfs: List[str]):
+    """Pick the (method, path, JSON body) of one request to an endpoint"""
+    if endpoint == 'ask':
+        return 'POST', '/ask', {'query': rng.choice(QUESTIONS)}
+    if endpoint == 'dashboard':
+        return 'GET', '/dashboard/stats', None
+    if endpoint == 'reload':
+        return 'POST', '/settings/reload_docs', {}
+    return 'GET', '/view_contract/' + quote(rng.choice(pdfs)), None
+
+def send(port: int, method: str, path: str, body, timeout: float) -> int:
+    """Send one request and read the whole response; returns the status code"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+def run_level(port: int, concurrency: int, mix: Dict[str, float], pdfs: List[str],
+              duration: float = None, total_requests: int = None, timeout: float = 120.0,
+              seed: int = 0) -> List[Dict]:
+    """Run ``concurrency`` clients until the duration passes or the request budget is spent"""
+    endpoints = [name for name in mix if name != 'view' or pdfs]
+    weights = [mix[name] for name in endpoints]
+    deadline = time.time() + duration if duration else None
+    budget = iter(range(total_requests)) if total_requests else None
+    budget_lock = threading.Lock()
+    samples = [[] for _ in range(concurrency)]
+
+    def client(worker: int):
+        rng = random.Random(seed * 1000 + worker)
+        while True:
+            if deadline is not None and time.time() >= deadline:
+                return
+            if budget is not None:
+                with budget_lock:
+                    if next(budget, None) is None:
+                        return
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, body = make_request(endpoint, rng, pdfs)
+            started = time.perf_counter()
+            try:
+                status = send(port, method, path, body, timeout)
+                error = None if status < 400 else f"HTTP {status}"
+            except Exception as e:
+                status, error = None, type(e).__name__
+            samples[worker].append({'endpoint': endpoint, 'latency': time.perf_counter() - started,
+                                    'status': status, 'error': error})
+
+    threads = [threading.Thread(target=client, args=(worker,)) for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [sample for worker_samples in samples for sample in worker_samples]
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict[str, Dict]:
+    """Throughput, error rate and latency percentiles per endpoint and over all requests"""
+    groups = {'all': samples}
+    for sample in samples:
+        groups.setdefault(sample['endpoint'], []).append(sample)
+
+    summary = {}
+    for name, group in groups.items():
+        latencies = np.asarray([sample['latency'] for sample in group]) if group else np.zeros(1)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        errors = [sample['error'] for sample in group if sample['error']]
+        summary[name] = {
+            'requests': len(group),
+            'errors': len(errors),
+            'error_rate': len(errors) / len(group) if group else 0.0,
+            'error_kinds': {kind: errors.count(kind) for kind in set(errors)},
+            'throughput': len(group) / elapsed if elapsed else 0.0,
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(latencies.max())
+        }
+    return summary
+
+def print_report(concurrency: int, elapsed: float, summary: Dict[str, Dict]):
+    print(f"\n=== {concurrency} concurrent clients, {elapsed:.1f}s ===")
+    print(f"{'endpoint':<12}{'requests':>9}{'errors':>8}{'err %':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name in sorted(summary, key=lambda n: (n == 'all', n)):
+        s = summary[name]
+        print(f"{name:<12}{s['requests']:>9}{s['errors']:>8}{s['error_rate'] * 100:>8.1f}{s['throughput']:>9.2f}"
+              f"{s['p50'] * 1000:>9.0f}{s['p95'] * 1000:>9.0f}{s['p99'] * 1000:>9.0f}{s['max'] * 1000:>9.0f}")
+        for kind, count in sorted(s['error_kinds'].items()):
+            print(f"{'':<12}  {kind}: {count}")
+
+def find_saturation(levels: List[Dict], min_gain: float = 1.1) -> Optional[int]:
+    """The concurrency after which adding clients no longer raises throughput by ``min_gain``"""
+    for previous, current in zip(levels, levels[1:]):
+        if current['summary']['all']['throughput'] < previous['summary']['all']['throughput'] * min_gain:
+            return previous['concurrency']
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the contract assistant over HTTP")
+    parser.add_argument('--contracts', default=Config.CONTRACTS_DIR, help="Folder of PDFs to index and serve")
+    parser.add_argument('--profile', choices=sorted(LATENCY_PROFILES), default='fast',
+                        help="Simulated embedding/LLM latency")
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help="Comma-separated client counts; each level is run in turn")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds per level")
+    parser.add_argument('--requests', type=int, help="Requests per level instead of a duration")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument('--cold', action='store_true', help="Skip the warm-up, so the first clients build the index")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--max-error-rate', type=float, help="Fail if any level's error rate is above this (0-1)")
+    parser.add_argument('--max-p95', type=float, help="Fail if any level's overall p95 is above this many seconds")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        levels = [int(level) for level in args.concurrency.split(',')]
+    except ValueError as e:
+        sys.exit(f"Error: {str(e)}")
+    pdfs = list_pdfs(args.contracts)
+    if not pdfs:
+        sys.exit(f"Error: no PDF files in {args.contracts}")
+
+    profile = LATENCY_PROFILES[args.profile]
+    work_dir = tempfile.mkdtemp(prefix='contractqa-loadtest-')
+    print(f"Load test: {len(pdfs)} contracts, profile '{args.profile}' {profile}, mix {mix}")
+
+    if not args.verbose:
+        warnings.simplefilter('ignore')
+    results = []
+    server = None
+    with contextlib.ExitStack() as stack:
+        app_output = contextlib.nullcontext()
+        if not args.verbose:
+            app_output = contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w')))
+        try:
+            app = create_app(make_config(args.contracts, work_dir, profile))
+            server, port = start_server(app)
+            if not args.cold:
+                print("Warming up (building the index)...")
+                with app_output:
+                    send(port, 'POST', '/ask', {'query': QUESTIONS[0]}, args.timeout)
+
+            for concurrency in levels:
+                started = time.time()
+                with app_output:
+                    samples = run_level(port, concurrency, mix, pdfs, duration=None if args.requests else args.duration,
+                                        total_requests=args.requests, timeout=args.timeout, seed=args.seed)
+                elapsed = time.time() - started
+                summary = summarize(samples, elapsed)
+                print_report(concurrency, elapsed, summary)
+                results.append({'concurrency': concurrency, 'elapsed': elapsed, 'summary': summary})
+        finally:
+            if server is not None:
+                server.shutdown()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    saturation = find_saturation(results)
+    if saturation is not None:
+        print(f"\nThroughput stops scaling beyond {saturation} concurrent clients")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'profile': args.profile, 'mix': mix, 'saturation': saturation, 'levels': results}, f, indent=2)
+
+    failures = []
+    for level in results:
+        overall = level['summary']['all']
+        if args.max_error_rate is not None and overall['error_rate'] > args.max_error_rate:
+            failures.append(f"{level['concurrency']} clients: error rate {overall['error_rate']:.1%}")
+        if args.max_p95 is not None and overall['p95'] > args.max_p95:
+            failures.append(f"{level['concurrency']} clients: p95 {overall['p95']:.2f}s")
+    if failures:
+        sys.exit("Thresholds exceeded: " + '; '.join(failures))
+
+if __name__ == '__main__':
+    main()
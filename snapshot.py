@@ -0,0 +1,51 @@
+"""Export and import portable index snapshots.
+
+    python snapshot.py export default contracts.cqsnap
+    python snapshot.py export default contracts-delta.cqsnap --base contracts.cqsnap
+    python snapshot.py import default contracts.cqsnap
+
+Snapshots need VECTOR_BACKEND=numpy and the same embedding provider on both sides.
+"""
+import argparse
+import sys
+
+from app import create_app
+from app.config_manager import ConfigManager
+from app.routes import configure_shards, get_corpora
+from app.corpora import shard_manager
+from app.snapshots import read_header
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a corpus index snapshot")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('corpus', help="Corpus name, 'default' for the contracts folder")
+    parser.add_argument('path', help="Snapshot file")
+    parser.add_argument('--base', help="Earlier snapshot to export a delta against")
+    args = parser.parse_args()
+
+    app = create_app()
+    config_manager = ConfigManager()
+    app.config['CONTRACTS_DIR'] = config_manager.get_contracts_dir() or app.config['CONTRACTS_DIR']
+
+    with app.app_context():
+        if args.corpus not in get_corpora():
+            sys.exit(f"Unknown corpus: {args.corpus}")
+        configure_shards()
+        shard = shard_manager.get(args.corpus)
+        try:
+            if args.action == 'export':
+                base_header = None
+                if args.base:
+                    with open(args.base, 'rb') as f:
+                        base_header = read_header(f)
+                with open(args.path, 'wb') as f:
+                    shard.export_snapshot(f, base_header)
+            else:
+                with open(args.path, 'rb') as f:
+                    summary = shard.import_snapshot(f)
+                print(f"Index for '{args.corpus}' now holds {summary['chunk_count']} chunks")
+        except ValueError as e:
+            sys.exit(f"Error: {str(e)}")
+
+if __name__ == '__main__':
+    main()
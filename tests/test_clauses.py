@@ -0,0 +1,33 @@
+from langchain.docstore.document import Document
+from app.clauses import ClauseIndex, classify_clause, extract_clauses, segment_clauses
+
+CONTRACT = """MASTER SERVICES AGREEMENT
+1. Payment Terms
+Fees are invoiced monthly and payable within 30 days.
+2. Termination
+Either party may terminate this agreement with 60 days written notice.
+3. Governing Law
+This agreement is governed by the laws of the State of New York.
+"""
+
+class TestClauses:
+    def test_segments_at_numbered_headings(self):
+        """Sections start at numbered headings and keep their page"""
+        sections = segment_clauses([(0, CONTRACT)])
+        assert [s['heading'] for s in sections] == ['', '1. Payment Terms', '2. Termination', '3. Governing Law']
+
+    def test_classify_uses_word_starts(self):
+        """'revenue' does not count as the governing-law phrase 'venue'"""
+        assert classify_clause('2. Revenue Share', 'We share 10% of net revenue.')[0][0] == 'payment'
+        assert all(t != 'governing_law' for t, _ in classify_clause('2. Revenue Share', 'net revenue'))
+
+    def test_index_lookup_by_contract_and_type(self, tmp_path):
+        """Clauses extracted at ingest are looked up by contract and clause type"""
+        docs = [Document(page_content=CONTRACT, metadata={'source': '/contracts/msa.pdf', 'page': 0})]
+        index = ClauseIndex(str(tmp_path / 'clauses.db'))
+        index.replace_files('default', extract_clauses(docs, '/contracts'))
+
+        clauses = index.lookup([('default', 'msa.pdf'), ('default', 'other.pdf')], ['termination', 'payment'])
+        assert clauses[('default', 'msa.pdf')]['termination'][0]['heading'] == '2. Termination'
+        assert clauses[('default', 'msa.pdf')]['payment'][0]['page'] == 1
+        assert clauses[('default', 'other.pdf')]['termination'] == []
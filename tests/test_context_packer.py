@@ -0,0 +1,50 @@
+import importlib
+import sys
+import types
+from langchain.docstore.document import Document
+from app import context_packer
+from app.context_packer import pack_context, merge_adjacent_chunks, estimate_tokens
+
+def make_doc(text, page=0, start=0, source='a.pdf'):
+    return Document(page_content=text, metadata={'source': source, 'page': page, 'start_index': start})
+
+class TestContextPacker:
+    def test_merges_overlapping_chunks_from_same_page(self):
+        """Adjacent chunks on one page are merged without repeating the overlap"""
+        first = make_doc("The term is five years", start=0)
+        second = make_doc("five years from signing", start=12)
+        merged = merge_adjacent_chunks([first, second])
+        assert len(merged) == 1
+        assert merged[0].page_content == "The term is five years from signing"
+
+    def test_keeps_chunks_from_different_pages(self):
+        """Chunks from different pages stay separate"""
+        docs = [make_doc("termination clause", page=1), make_doc("payment terms", page=2)]
+        assert len(merge_adjacent_chunks(docs)) == 2
+
+    def test_drops_redundant_chunks(self):
+        """Near-duplicate chunks are dropped"""
+        text = "Either party may terminate this agreement with thirty days notice"
+        docs = [(make_doc(text, page=1), 0.9), (make_doc(text, page=3), 0.85),
+                (make_doc("Payment is due within 45 days of invoice", page=2), 0.5)]
+        packed, stats = pack_context(docs, token_budget=1000)
+        assert stats['dropped_redundant'] == 1
+        assert len(packed) == 2
+
+    def test_respects_token_budget(self):
+        """Packing stops adding chunks once the budget is spent and reports savings"""
+        docs = [(make_doc(f"clause {i} " + "text " * 200, page=i), 1.0 - i * 0.01) for i in range(10)]
+        packed, stats = pack_context(docs, token_budget=600)
+        assert stats['packed_tokens'] <= 600
+        assert stats['tokens_saved'] > 0
+        assert stats['packed_tokens'] == sum(estimate_tokens(d.page_content) for d in packed)
+
+    def test_encoding_loads_lazily_with_fallback(self, monkeypatch):
+        """Importing fetches no encoding, and counting falls back to ~4 characters per token"""
+        def unavailable(name):
+            raise OSError("no network")
+        monkeypatch.setitem(sys.modules, 'tiktoken', types.SimpleNamespace(get_encoding=unavailable))
+        monkeypatch.setattr(context_packer, '_encoding', None)
+        importlib.reload(context_packer)
+        assert context_packer._encoding is None
+        assert context_packer.estimate_tokens("x" * 10) == 3
@@ -0,0 +1,68 @@
+import threading
+import time
+from langchain.docstore.document import Document
+from app.corpora import ShardManager, ShardSet
+
+class FakeVectorStore:
+    def __init__(self, name, scores):
+        self.name = name
+        self.scores = scores
+
+    def similarity_search_with_relevance_scores(self, query, k=4):
+        return [(Document(page_content=f"{self.name}-{i}", metadata={'corpus': self.name}), score)
+                for i, score in enumerate(self.scores[:k])]
+
+class TestShardManager:
+    def test_fan_out_merges_top_k(self):
+        """Results from several shards are merged by relevance score"""
+        manager = ShardManager()
+        manager.configure({'sales': '/sales', 'legal': '/legal'})
+        manager.get('sales').vectorstore = FakeVectorStore('sales', [0.9, 0.4])
+        manager.get('legal').vectorstore = FakeVectorStore('legal', [0.8, 0.7])
+
+        results = ShardSet(manager, ['sales', 'legal']).similarity_search_with_relevance_scores('q', k=3)
+        assert [doc.page_content for doc, _ in results] == ['sales-0', 'legal-0', 'legal-1']
+
+    def test_configure_keeps_unchanged_shards(self):
+        """Adding a corpus does not reset the shards of the others"""
+        manager = ShardManager()
+        manager.configure({'sales': '/sales'})
+        sales = manager.get('sales')
+        sales.vectorstore = FakeVectorStore('sales', [0.5])
+
+        manager.configure({'sales': '/sales', 'legal': '/legal'})
+        assert manager.get('sales') is sales
+        assert manager.get('legal').vectorstore is None
+
+        manager.configure({'sales': '/sales-moved', 'legal': '/legal'})
+        assert manager.get('sales').vectorstore is None
+
+    def test_search_not_blocked_by_builds(self):
+        """Fan-out queries run while every build worker is busy"""
+        manager = ShardManager()
+        manager.configure({f"unit{i}": f"/unit{i}" for i in range(14)})
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def blocked_build(force=True):
+            started.release()
+            return release.wait(10)
+        for name in list(manager.shards):
+            manager.get(name).build = blocked_build
+        manager.get('unit0').vectorstore = FakeVectorStore('unit0', [0.9])
+        manager.get('unit1').vectorstore = FakeVectorStore('unit1', [0.8])
+
+        rebuilding = threading.Thread(target=manager.rebuild, args=([f"unit{i}" for i in range(2, 14)],))
+        rebuilding.start()
+        for _ in range(4):
+            assert started.acquire(timeout=5)
+        time.sleep(0.1)  # Let any remaining build workers pick up their builds
+        try:
+            searched = time.time()
+            results = manager.search('q', ['unit0', 'unit1'], k=2)
+            assert time.time() - searched < 2
+            assert [doc.page_content for doc, _ in results] == ['unit0-0', 'unit1-0']
+            assert rebuilding.is_alive()
+        finally:
+            release.set()
+            rebuilding.join()
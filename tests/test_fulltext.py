@@ -0,0 +1,48 @@
+import pytest
+from app.fulltext import FullTextIndex
+
+@pytest.fixture
+def index(tmp_path):
+    index = FullTextIndex(str(tmp_path / 'fulltext.db'))
+    index.replace_files('sales', [
+        ('acme.pdf', 0, 'The buyer shall pay liquidated damages of 5% per week of delay.'),
+        ('acme.pdf', 1, 'Either party may terminate with thirty days notice.'),
+        ('globex.pdf', 0, 'Damages are limited to the fees paid <in> the prior year.'),
+    ], state={'acme.pdf': [1, 1], 'globex.pdf': [1, 1]})
+    index.replace_files('legal', [('nda.pdf', 2, 'No liquidated damages apply to confidential disclosures.')])
+    return index
+
+class TestFullTextIndex:
+    def test_phrase_query_with_snippet(self, index):
+        """Phrase queries match across corpora and highlight the hit"""
+        results = index.search('"liquidated damages"')
+        assert results['total'] == 2
+        assert {r['file'] for r in results['results']} == {'acme.pdf', 'nda.pdf'}
+        assert '<mark>liquidated damages</mark>' in results['results'][0]['snippet']
+
+    def test_prefix_boolean_and_corpus_filter(self, index):
+        """Prefix and boolean queries can be restricted to corpora"""
+        results = index.search('damage* NOT liquidated', corpora=['sales'])
+        assert [(r['file'], r['page']) for r in results['results']] == [('globex.pdf', 1)]
+        assert '&lt;in&gt;' in results['results'][0]['snippet']
+
+    def test_pagination(self, index):
+        """Results are paged while the total covers every hit"""
+        results = index.search('damages', page=2, per_page=2)
+        assert results['total'] == 3
+        assert len(results['results']) == 1
+
+    def test_invalid_query_and_state(self, index):
+        """Malformed queries raise ValueError and corpus state is tracked"""
+        with pytest.raises(ValueError):
+            index.search('"unbalanced')
+        assert index.is_current('sales', {'acme.pdf': [1, 1], 'globex.pdf': [1, 1]})
+        assert not index.is_current('sales', {'acme.pdf': [2, 1]})
+
+    def test_shared_instance_and_retain(self, index, tmp_path):
+        """open() reuses one instance per database and retain_corpora drops other corpora"""
+        shared = FullTextIndex.open(str(tmp_path / 'fulltext.db'))
+        assert shared is FullTextIndex.open(str(tmp_path / 'fulltext.db'))
+        shared.retain_corpora(['legal'])
+        assert {r['corpus'] for r in shared.search('damages')['results']} == {'legal'}
+        assert not shared.is_current('sales', {'acme.pdf': [1, 1], 'globex.pdf': [1, 1]})
@@ -0,0 +1,43 @@
+import fitz
+import pytest
+from app import create_app
+from loadtest import LATENCY_PROFILES, find_saturation, make_config, parse_mix, run_level, start_server, summarize
+
+class TestLoadTest:
+    def test_summary_percentiles_and_errors(self):
+        """Latency percentiles, throughput and error rates are reported per endpoint"""
+        samples = [{'endpoint': 'ask', 'latency': i / 100, 'status': 200, 'error': None} for i in range(1, 101)]
+        samples.append({'endpoint': 'view', 'latency': 0.5, 'status': 500, 'error': 'HTTP 500'})
+        summary = summarize(samples, elapsed=10.0)
+        assert summary['ask']['p50'] == pytest.approx(0.505)
+        assert summary['ask']['p99'] == pytest.approx(0.9901)
+        assert summary['view']['error_rate'] == 1.0
+        assert summary['all']['throughput'] == pytest.approx(10.1)
+
+    def test_saturation_and_mix(self):
+        """Saturation is the last level that still scaled throughput"""
+        levels = [{'concurrency': c, 'summary': {'all': {'throughput': t}}} for c, t in [(1, 10), (4, 38), (16, 40)]]
+        assert find_saturation(levels) == 4
+        assert parse_mix('ask=3,view') == {'ask': 3.0, 'view': 1.0}
+        with pytest.raises(ValueError):
+            parse_mix('upload=1')
+
+    def test_drives_every_endpoint(self, tmp_path):
+        """A short run against the real app hits each endpoint without errors"""
+        contracts = tmp_path / 'contracts'
+        contracts.mkdir()
+        pdf = fitz.open()
+        pdf.new_page().insert_text((72, 72), 'Either party may terminate with thirty days notice.')
+        pdf.save(str(contracts / 'acme.pdf'))
+
+        app = create_app(make_config(str(contracts), str(tmp_path / 'work'), LATENCY_PROFILES['none']))
+        server, port = start_server(app)
+        try:
+            samples = run_level(port, 3, parse_mix('ask=1,dashboard=1,view=1,reload=1'), ['acme.pdf'],
+                                total_requests=40, timeout=60)
+        finally:
+            server.shutdown()
+        summary = summarize(samples, elapsed=1.0)
+        assert summary['all']['requests'] == 40
+        assert summary['all']['errors'] == 0
+        assert {'ask', 'dashboard', 'view', 'reload'} <= set(summary)
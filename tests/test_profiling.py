@@ -0,0 +1,96 @@
+import os
+import time
+import fitz
+import pytest
+from flask import Flask
+from app import profiling
+from app.corpora import ShardManager
+from app.profiling import PROFILE_HEADER, list_profiles, profile_block
+
+def busy_helper():
+    return sum(i * i for i in range(20000))
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_ALLOW_HEADER=True,
+                      PROFILE_DIR=str(tmp_path / 'profiles'), PROFILE_MAX_FILES=3)
+    return app
+
+def run_profiled(name='work'):
+    with profile_block(name):
+        busy_helper()
+    time.sleep(0.002)  # Profile ids have millisecond resolution
+
+def saved(app):
+    profile_dir = app.config['PROFILE_DIR']
+    return sorted(os.listdir(profile_dir)) if os.path.exists(profile_dir) else []
+
+class TestProfiling:
+    def test_sampling_and_header_opt_in(self, app):
+        """Sample rate 0 profiles nothing unless the request opts in by header"""
+        app.config['PROFILING_SAMPLE_RATE'] = 0.0
+        with app.test_request_context('/ask'):
+            run_profiled()
+        assert saved(app) == []
+        with app.test_request_context('/ask', headers={PROFILE_HEADER: '1'}):
+            run_profiled()
+        assert len([f for f in saved(app) if f.endswith('.prof')]) == 1
+
+    def test_rotation_keeps_newest(self, app):
+        """Only PROFILE_MAX_FILES profiles and their sidecars are kept"""
+        with app.app_context():
+            for i in range(5):
+                run_profiled(f"call{i}")
+        files = saved(app)
+        assert len(files) == 6
+        assert sorted(f.split('-')[3] for f in files if f.endswith('.prof')) == ['call2', 'call3', 'call4']
+
+    def test_list_profiles_reports_hot_functions(self, app):
+        """Listed profiles are newest first and name the functions that ran"""
+        with app.app_context():
+            run_profiled('first')
+            run_profiled('second')
+        profiles = list_profiles(app.config['PROFILE_DIR'], limit=5, top_n=50)
+        assert [p['name'] for p in profiles] == ['second', 'first']
+        hottest = profiles[0]['top_functions']
+        assert any(f['function'].startswith('busy_helper') for f in hottest)
+        assert all({'calls', 'total_time', 'cumulative_time'} <= set(f) for f in hottest)
+
+    def test_concurrent_and_failed_profilers_run_unprofiled(self, app, monkeypatch):
+        """A block that cannot get the profiler still runs, and profiling recovers afterwards"""
+        with app.app_context():
+            with profile_block('outer'):
+                with profile_block('inner'):
+                    busy_helper()
+            assert len([f for f in saved(app) if f.endswith('.prof')]) == 1
+
+            class BrokenProfile(profiling.cProfile.Profile):
+                def enable(self):
+                    raise ValueError("Another profiling tool is already active")
+            monkeypatch.setattr(profiling.cProfile, 'Profile', BrokenProfile)
+            with profile_block('broken'):
+                busy_helper()
+            monkeypatch.undo()
+            time.sleep(0.002)
+            run_profiled('after')
+        names = [f.split('-')[3] for f in saved(app) if f.endswith('.prof')]
+        assert sorted(names) == ['after', 'outer']
+
+    def test_builds_on_pool_threads_are_profiled(self, app, tmp_path):
+        """Shard rebuilds run on the build pool still save an 'ingest' profile"""
+        corpora = {}
+        for name in ('a', 'b'):
+            contracts_dir = tmp_path / name
+            contracts_dir.mkdir()
+            pdf = fitz.open()
+            pdf.new_page().insert_text((72, 72), f"Contract {name} may be terminated with notice.")
+            pdf.save(str(contracts_dir / f"{name}.pdf"))
+            corpora[name] = str(contracts_dir)
+        manager = ShardManager()
+        manager.configure(corpora, {'backend': 'numpy', 'index_dir': str(tmp_path / 'index'),
+                                    'embedding': {'provider': 'hashing', 'dimension': 64}})
+        with app.app_context():
+            assert manager.rebuild(['a', 'b']) == {'a': True, 'b': True}
+        names = [f.split('-')[3] for f in saved(app) if f.endswith('.prof')]
+        assert 'ingest' in names
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from app.providers import (EMBEDDING_PROVIDERS, EmbeddingProvider, HashingEmbeddings, ExtractiveLLM,
+                           create_embeddings, get_embedding_settings, register_embedding_provider)
+
+class TestProviders:
+    def test_hashing_embeddings_are_normalized_and_deterministic(self):
+        """Local embeddings have the declared dimension and unit length"""
+        embeddings = HashingEmbeddings(dimension=256)
+        first, second = embeddings.embed_documents(["termination for convenience"] * 2)
+        assert len(first) == 256
+        assert first == second
+        assert np.linalg.norm(first) == pytest.approx(1.0)
+
+    def test_hashing_embeddings_rank_related_text_higher(self):
+        """Texts sharing terms are closer than unrelated texts"""
+        embeddings = HashingEmbeddings()
+        query = np.array(embeddings.embed_query("termination notice period"))
+        related = np.array(embeddings.embed_query("the termination notice period is thirty days"))
+        unrelated = np.array(embeddings.embed_query("payment is due upon invoice"))
+        assert query @ related > query @ unrelated
+
+    def test_settings_declare_dimension(self):
+        """Provider settings carry the name and dimension recorded in index manifests"""
+        settings = get_embedding_settings({'EMBEDDING_PROVIDER': 'hashing', 'HASHING_EMBEDDING_DIM': 128})
+        assert settings == {'provider': 'hashing', 'dimension': 128}
+        assert create_embeddings(settings).dimension == 128
+
+        with pytest.raises(ValueError):
+            get_embedding_settings({'EMBEDDING_PROVIDER': 'missing'})
+
+    def test_extractive_llm_answers_from_context(self):
+        """The stand-in LLM returns the context sentence that matches the question"""
+        prompt = ("Question: When does the agreement terminate?\n"
+                  "Context: Payment is due monthly. The agreement will terminate on May 1, 2025.\n"
+                  "Answer: ")
+        assert ExtractiveLLM(max_sentences=1).invoke(prompt) == "The agreement will terminate on May 1, 2025."
+
+    def test_incomplete_provider_fails_at_registration(self):
+        """A provider missing settings or create is rejected when it is registered"""
+        class Incomplete(EmbeddingProvider):
+            name = 'incomplete'
+
+            @classmethod
+            def create(cls, settings):
+                return HashingEmbeddings()
+
+        with pytest.raises(TypeError, match='settings'):
+            register_embedding_provider(Incomplete)
+        assert 'incomplete' not in EMBEDDING_PROVIDERS
@@ -0,0 +1,117 @@
+import fitz
+import pytest
+from app import create_app, routes
+from app.corpora import shard_manager
+from app.fulltext import FullTextIndex
+from config import Config
+
+def write_pdf(path, lines):
+    pdf = fitz.open()
+    pdf.new_page().insert_text((72, 72), '\n'.join(lines))
+    pdf.save(str(path))
+
+@pytest.fixture
+def test_config(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))  # config.ini of the test
+    class TestConfig(Config):
+        CONTRACTS_DIR = str(tmp_path / 'contracts')
+        CORPORA = {}
+        VECTOR_BACKEND = 'numpy'
+        INDEX_DIR = str(tmp_path / 'index')
+        FULLTEXT_DB = str(tmp_path / 'index' / 'fulltext.db')
+        CLAUSE_DB = str(tmp_path / 'index' / 'clauses.db')
+        EMBEDDING_PROVIDER = 'hashing'
+        LLM_PROVIDER = 'extractive'
+    (tmp_path / 'contracts').mkdir()
+    write_pdf(tmp_path / 'contracts' / 'acme.pdf', [
+        '1. Termination',
+        'Either party may terminate with thirty days notice.',
+        '2. Payment',
+        'Fees are payable within sixty days of invoice.'
+    ])
+    return TestConfig
+
+@pytest.fixture
+def client(test_config):
+    return create_app(test_config).test_client()
+
+class TestRequestValidation:
+    @pytest.mark.parametrize('body', [{'query': None}, {'query': 5}, ['termination'], {'query': 'x', 'corpora': 7}])
+    def test_malformed_ask_is_rejected(self, client, body):
+        """Malformed /ask bodies get a JSON 400 instead of a server error"""
+        response = client.post('/ask', json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+class TestPageIndexes:
+    def test_search_works_on_a_fresh_app(self, client):
+        """/search indexes page text on demand, without building the vector index"""
+        results = client.get('/search?q=terminate').get_json()
+        assert results['total'] == 1
+        assert results['results'][0]['file'] == 'acme.pdf'
+        assert shard_manager.get('default').vectorstore is None
+
+    def test_search_skips_removed_corpora(self, client, tmp_path):
+        """Pages of corpora that are no longer configured are dropped"""
+        index = FullTextIndex.open(str(tmp_path / 'index' / 'fulltext.db'))
+        index.replace_files('retired', [('old.pdf', 0, 'Termination requires ninety days notice.')])
+        results = client.get('/search?q=termination').get_json()
+        assert {r['corpus'] for r in results['results']} == {'default'}
+        assert {r['corpus'] for r in index.search('termination')['results']} == {'default'}
+
+    def test_search_does_not_scan_the_folder(self, client, tmp_path, monkeypatch):
+        """Once a corpus is indexed, /search leaves folder rescans to the background refresh"""
+        client.get('/search?q=terminate')
+        def scan(contracts_dir):
+            raise AssertionError("folder scanned on the query path")
+        monkeypatch.setattr('app.corpora.scan_file_state', scan)
+        write_pdf(tmp_path / 'contracts' / 'globex.pdf', ['Globex may terminate for convenience.'])
+        assert client.get('/search?q=terminate').get_json()['total'] == 1
+
+        monkeypatch.undo()
+        shard_manager.get('default').refresh_pages()
+        assert client.get('/search?q=terminate').get_json()['total'] == 2
+
+class TestCompare:
+    def test_clause_types_and_compare_on_a_fresh_app(self, client):
+        """Clause lookups fill the clause index without building the vector index"""
+        listed = client.get('/compare/clause_types').get_json()
+        assert listed['contracts'][0]['file'] == 'acme.pdf'
+        result = client.post('/compare', json={'contracts': ['acme.pdf'], 'clause_types': ['termination']}).get_json()
+        assert 'thirty days' in result['contracts'][0]['clauses']['termination'][0]['text']
+        assert shard_manager.get('default').vectorstore is None
+
+    @pytest.mark.parametrize('body', [{'contracts': [123]}, {'contracts': [{'file': 5}]}, {'contracts': 'acme.pdf'},
+                                      {'contracts': ['acme.pdf'], 'clause_types': 'termination'}, [1]])
+    def test_malformed_contracts_are_rejected(self, client, body):
+        """Malformed contract entries get a JSON 400"""
+        response = client.post('/compare', json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+class TestCorpora:
+    def test_added_corpus_survives_restart(self, client, test_config, tmp_path):
+        """Saved corpora keep their case and are loaded again by a new app"""
+        (tmp_path / 'sales').mkdir()
+        assert client.post('/corpora', json={'name': 'Sales', 'path': str(tmp_path / 'sales')}).status_code == 200
+        restarted = create_app(test_config).test_client()
+        names = {corpus['name'] for corpus in restarted.get('/corpora').get_json()['corpora']}
+        assert names == {'default', 'Sales'}
+
+        assert restarted.delete('/corpora/Sales').get_json()['success']
+        assert restarted.delete('/corpora/default').status_code == 400
+        restarted = create_app(test_config).test_client()
+        assert [corpus['name'] for corpus in restarted.get('/corpora').get_json()['corpora']] == ['default']
+
+    @pytest.mark.parametrize('body', [{'name': 5, 'path': '/tmp'}, {'name': 'a,b', 'path': '/tmp'}, ['x'], {'name': 'x'}])
+    def test_malformed_corpus_is_rejected(self, client, body):
+        """Bad corpus names and bodies get a JSON 400"""
+        response = client.post('/corpora', json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    def test_reload_resets_all_corpora_chain(self, client):
+        """Reloading one corpus lets the default /ask chain pick it up"""
+        routes.qa_chain = object()
+        assert client.post('/corpora/default/reload').get_json()['success']
+        assert routes.qa_chain is None
@@ -0,0 +1,143 @@
+import gzip
+import io
+import json
+import shutil
+import threading
+import fitz
+import pytest
+from app.corpora import IndexShard
+
+OPTIONS = {'backend': 'numpy', 'embedding': {'provider': 'hashing', 'dimension': 64}}
+
+def write_pdf(path, text):
+    pdf = fitz.open()
+    pdf.new_page().insert_text((72, 72), text)
+    pdf.save(str(path))
+
+def make_shard(tmp_path, name, files):
+    contracts_dir = tmp_path / name / 'contracts'
+    contracts_dir.mkdir(parents=True)
+    for file, text in files.items():
+        write_pdf(contracts_dir / file, text)
+    return IndexShard('default', str(contracts_dir), dict(OPTIONS, index_dir=str(tmp_path / name / 'index')))
+
+def export(shard, base=None):
+    out = io.BytesIO()
+    header = shard.export_snapshot(out, base)
+    return header, out.getvalue()
+
+@pytest.fixture
+def central(tmp_path):
+    shard = make_shard(tmp_path, 'central', {'acme.pdf': 'Either party may terminate with thirty days notice.',
+                                             'globex.pdf': 'Fees are payable within sixty days of invoice.'})
+    assert shard.build()
+    return shard
+
+class TestSnapshots:
+    def test_import_embeds_only_local_differences(self, tmp_path, central):
+        """A client keeps the imported chunks of identical files and embeds only its own"""
+        header, data = export(central)
+        client = make_shard(tmp_path, 'client', {'local.pdf': 'Local warranty lasts twelve months.'})
+        shutil.copy(f"{central.contracts_dir}/acme.pdf", client.contracts_dir)
+        client._sync = wrapped = _spy(client._sync)
+
+        summary = client.import_snapshot(io.BytesIO(data))
+        assert summary['id'] == header['id']
+        assert wrapped.replaced == ['local.pdf', 'globex.pdf']
+        titles = {doc.metadata['title'] for doc, _ in client.search('terminate notice warranty', k=10)}
+        assert titles == {'acme.pdf', 'local.pdf'}
+        source = client.search('terminate', k=1)[0][0].metadata['source']
+        assert source.startswith(client.contracts_dir)
+
+    def test_delta_applies_on_its_base(self, tmp_path, central):
+        """A delta carries only changed files and needs the client to be at its base"""
+        base_header, base = export(central)
+        write_pdf(f"{central.contracts_dir}/initech.pdf", 'Initech indemnifies the customer.')
+        central.vectorstore = None
+        central.build(force=False)
+        delta_header, delta = export(central, base_header)
+        assert delta_header['changed'] == ['initech.pdf'] and delta_header['chunks'] == 1
+
+        client = make_shard(tmp_path, 'client', {})
+        with pytest.raises(ValueError):
+            client.import_snapshot(io.BytesIO(delta))
+        client.import_snapshot(io.BytesIO(base))
+        summary = client.import_snapshot(io.BytesIO(delta))
+        assert summary['kind'] == 'delta'
+        assert client.vectorstore.manifest['snapshot_id'] == delta_header['id']
+
+    def test_corrupt_snapshot_is_rejected(self, tmp_path, central):
+        """A tampered stream fails its checksum and leaves the index untouched"""
+        _, data = export(central)
+        tampered = gzip.compress(gzip.decompress(data).replace(b'thirty', b'ninety'))
+        client = make_shard(tmp_path, 'client', {})
+        with pytest.raises(ValueError, match='checksum'):
+            client.import_snapshot(io.BytesIO(tampered))
+        assert client.vectorstore is None
+
+    @pytest.mark.parametrize('lines', [
+        [{'chunks': 10 ** 9, 'dim': 10 ** 6}],
+        [{}, {'file': 'acme.pdf', 'text': 'x', 'metadata': {}}],
+        [{}, {'file': 'acme.pdf', 'text': 'x', 'metadata': {}, 'vector': ''}],
+        [{}, ['not', 'a', 'chunk']]
+    ])
+    def test_malformed_snapshot_is_rejected(self, tmp_path, central, lines):
+        """Bad shapes and chunks without their fields are ValueErrors, before anything is allocated"""
+        header, _ = export(central)
+        lines = [dict(header, **lines[0])] + lines[1:] + [{'end': True, 'chunks': 1, 'sha256': ''}]
+        data = gzip.compress(b''.join(json.dumps(line).encode('utf-8') + b'\n' for line in lines))
+        client = make_shard(tmp_path, 'client', {})
+        with pytest.raises(ValueError):
+            client.import_snapshot(io.BytesIO(data))
+
+    def test_files_in_subfolders_match(self, tmp_path):
+        """File keys are POSIX paths, so identical files in subfolders are not re-embedded"""
+        central = make_shard(tmp_path, 'central', {})
+        (tmp_path / 'central' / 'contracts' / 'emea').mkdir()
+        write_pdf(tmp_path / 'central' / 'contracts' / 'emea' / 'acme.pdf', 'Either party may terminate.')
+        assert central.build()
+        assert set(central.vectorstore.manifest['file_hashes']) == {'emea/acme.pdf'}
+
+        _, data = export(central)
+        client = make_shard(tmp_path, 'client', {})
+        shutil.copytree(tmp_path / 'central' / 'contracts' / 'emea', tmp_path / 'client' / 'contracts' / 'emea')
+        client._sync = wrapped = _spy(client._sync)
+        client.import_snapshot(io.BytesIO(data))
+        assert wrapped.replaced in (None, [])
+        assert client.search('terminate', k=1)[0][0].metadata['source'] == \
+            str(tmp_path / 'client' / 'contracts' / 'emea' / 'acme.pdf')
+
+class TestSharedIndexDir:
+    def test_workers_build_once_and_follow_rebuilds(self, tmp_path):
+        """Shards of several workers on one index directory build it once and pick up each other's rebuilds"""
+        first = make_shard(tmp_path, 'shared', {'acme.pdf': 'Either party may terminate with thirty days notice.'})
+        second = IndexShard('default', first.contracts_dir, first.options)
+        builds = []
+        for shard in (first, second):
+            shard._create_vectorstore = _counting(shard._create_vectorstore, builds)
+        threads = [threading.Thread(target=shard.build, kwargs={'force': False}) for shard in (first, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1
+        assert first.chunk_count == second.chunk_count == 1
+
+        write_pdf(f"{first.contracts_dir}/globex.pdf", 'Fees are payable within sixty days of invoice.')
+        assert first.build()
+        titles = {doc.metadata['title'] for doc, _ in second.search('fees payable invoice', k=10)}
+        assert titles == {'acme.pdf', 'globex.pdf'}
+        assert second.chunk_count == 2
+
+def _counting(create, calls):
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return create(*args, **kwargs)
+    return wrapper
+
+def _spy(sync):
+    def wrapper(index, files):
+        wrapper.replaced, documents = sync(index, files)
+        return wrapper.replaced, documents
+    wrapper.replaced = None
+    return wrapper
@@ -0,0 +1,94 @@
+import os
+import threading
+import numpy as np
+import pytest
+from app.vector_index import NumpyVectorIndex
+
+class FakeEmbeddings:
+    """Deterministic random vectors per text"""
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(sum(map(ord, text)))
+        return list(rng.normal(size=32))
+
+def build_index(path, dtype):
+    texts = [f"clause number {i}" for i in range(50)]
+    metadatas = [{'title': f"contract{i % 5}.pdf", 'contract_type': 'Other' if i % 2 else 'Non-Disclosure Agreement'}
+                 for i in range(50)]
+    return NumpyVectorIndex.from_texts(texts, FakeEmbeddings(), metadatas, path=str(path), dtype=dtype)
+
+class TestNumpyVectorIndex:
+    @pytest.mark.parametrize('dtype', ['float16', 'int8'])
+    def test_exact_match_ranks_first(self, tmp_path, dtype):
+        """Quantized search still returns the identical vector first"""
+        index = build_index(tmp_path / dtype, dtype)
+        doc, score = index.similarity_search_with_score("clause number 7", k=3)[0]
+        assert doc.page_content == "clause number 7"
+        assert score == pytest.approx(1.0, abs=0.01)
+
+    def test_metadata_prefilter(self, tmp_path):
+        """Only rows matching the filter are scored"""
+        index = build_index(tmp_path / 'idx', 'float16')
+        results = index.similarity_search("clause number 7", k=10,
+                                          filter={'title': ['contract1.pdf', 'contract3.pdf'], 'contract_type': 'Other'})
+        assert results
+        assert all(doc.metadata['title'] in ('contract1.pdf', 'contract3.pdf') for doc in results)
+        assert all(doc.metadata['contract_type'] == 'Other' for doc in results)
+
+    def test_reopen_and_append(self, tmp_path):
+        """A reopened index is memory-mapped and can be appended to"""
+        build_index(tmp_path / 'idx', 'int8')
+        index = NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())
+        assert len(index) == 50
+        assert isinstance(index._vectors, np.memmap)
+
+        index.add_texts(["late addendum"], [{'title': 'addendum.pdf'}])
+        assert len(index) == 51
+        assert index.similarity_search("late addendum", k=1)[0].metadata['title'] == 'addendum.pdf'
+
+    def test_concurrent_writers_share_directory(self, tmp_path):
+        """Writers serialize on the directory lock instead of deleting each other's staging"""
+        errors = []
+        def write():
+            try:
+                build_index(tmp_path / 'idx', 'float16')
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert len(NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())) == 50
+
+    def test_stale_reader_sees_new_generation(self, tmp_path):
+        """A reader notices a newer generation and the one it replaced is kept"""
+        build_index(tmp_path / 'idx', 'float16')
+        reader = NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())
+        assert not reader.is_stale()
+
+        writer = NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())
+        writer.add_texts(["late addendum"], [{'title': 'addendum.pdf'}])
+        writer.add_texts(["second addendum"], [{'title': 'addendum2.pdf'}])
+        assert reader.is_stale()
+        assert len(reader) == 50
+        generations = [entry for entry in os.listdir(tmp_path / 'idx') if entry.startswith('g')]
+        assert len(generations) == 2
+
+    def test_update_publishes_one_generation(self, tmp_path):
+        """Kept int8 rows are copied as stored, and rows and manifest appear in one generation"""
+        index = build_index(tmp_path / 'idx', 'int8')
+        kept = np.array(index._vectors[10:]), np.array(index._scales[10:])
+        reader = NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())
+
+        index.update(keep=np.arange(50) >= 10, texts=["late addendum"], metadatas=[{'title': 'addendum.pdf'}],
+                     vectors=np.asarray(FakeEmbeddings().embed_documents(["late addendum"])),
+                     manifest={'files': {'addendum.pdf': [1, 2]}})
+        assert np.array_equal(index._vectors[:40], kept[0]) and np.array_equal(index._scales[:40], kept[1])
+        assert reader.is_stale()
+        reopened = NumpyVectorIndex(str(tmp_path / 'idx'), FakeEmbeddings())
+        assert len(reopened) == 41 and reopened.manifest['files'] == {'addendum.pdf': [1, 2]}
+        assert reopened.similarity_search("late addendum", k=1)[0].metadata['title'] == 'addendum.pdf'